@@ -0,0 +1,406 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Прогон мониторов на локальной MySQL (из MYSQL_* в окружении) и фейковом Slack.
+# Таблицы транзакций в этой базе ОЧИЩАЮТСЯ — запускать только на одноразовом сервере.
+# Каждый сценарий идёт в отдельном процессе: у мониторов модульные синглтоны
+# (пулы, outbox, состояние), и сценарии не должны делить их между собой.
+#
+#   python benchmark.py --monitors cashouts,deposit_stream --sizes 1000,10000
+#
+# Поведение фейкового Slack задаётся через FAKE_SLACK_* (задержка, доля 429 и ошибок).
+
+BENCH_MONITORS = ('cashouts', 'exchange_transactions', 'deposit_stream')
+BENCH_SIZES = (1000, 10000, 100000)
+BENCH_TIMEOUT = float(os.environ.get("BENCH_TIMEOUT", 1800))
+BENCH_INSERT_BATCH = 1000
+BENCH_MERCHANTS = 50
+BENCH_PROJECTS = 100
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1')
+RESULT_PREFIX = "BENCH_RESULT "
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS projects (
+        id INT PRIMARY KEY,
+        name VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS project_withdrawal_crypto_transactions (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        status VARCHAR(32) NOT NULL,
+        amount DECIMAL(36, 8) NOT NULL,
+        currency_network VARCHAR(32) NOT NULL,
+        hash_transaction VARCHAR(128),
+        owner_merchant_id INT NOT NULL,
+        project_id INT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS project_exchange_transactions (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        status VARCHAR(32) NOT NULL,
+        amount_from DECIMAL(36, 8) NOT NULL,
+        currency_from VARCHAR(32) NOT NULL,
+        amount_to DECIMAL(36, 8) NOT NULL,
+        currency_to VARCHAR(32) NOT NULL,
+        rate DECIMAL(36, 8) NOT NULL,
+        fee_exchange DECIMAL(36, 8) NOT NULL,
+        owner_merchant_id INT NOT NULL,
+        project_id INT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS project_deposit_crypto_transactions (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        status VARCHAR(32) NOT NULL,
+        amount DECIMAL(36, 8) NOT NULL,
+        currency_name VARCHAR(32) NOT NULL,
+        risk_score DECIMAL(5, 2),
+        owner_merchant_id INT NOT NULL,
+        project_id INT NOT NULL,
+        created_at DATETIME NOT NULL
+    )
+    """,
+    "CREATE DATABASE IF NOT EXISTS core",
+    """
+    CREATE TABLE IF NOT EXISTS core.project_transactions (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        owner_merchant_id INT NOT NULL,
+        amount DECIMAL(36, 8) NOT NULL,
+        created_at DATETIME NOT NULL,
+        KEY created_at (created_at),
+        KEY correlation (amount, owner_merchant_id, created_at)
+    )
+    """,
+)
+
+TABLES = {
+    'cashouts': "project_withdrawal_crypto_transactions",
+    'exchange_transactions': "project_exchange_transactions",
+    'deposit_stream': "project_deposit_crypto_transactions",
+}
+
+
+def _configure_child_env(state_dir):
+    # До импорта мониторов: их настройки читаются на уровне модулей.
+    os.environ["STATE_DB_PATH"] = os.path.join(state_dir, "state.sqlite3")
+    os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-benchmark")
+    os.environ.setdefault("SLACK_CHANNEL_ID", "CBENCHMARK")
+    os.environ.setdefault("SLACK_RISK_ID", "CBENCHRISK")
+    # Меряем конвейер, а не лимиты Slack и не сводки: каждая строка — отдельное сообщение.
+    os.environ.setdefault("SLACK_CHANNEL_RATE", "1000000")
+    os.environ.setdefault("SLACK_CHANNEL_BURST", "1000000")
+    os.environ.setdefault("DIGEST_ROW_THRESHOLD", "1000000000")
+    os.environ.setdefault("DIGEST_QUEUE_THRESHOLD", "1000000000")
+    os.environ.setdefault("POLL_INTERVAL_MAX", "1")
+
+
+class StageTimings:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def timed(self, stage, func):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+        return wrapper
+
+    def timed_pages(self, func):
+        def wrapper(*args, **kwargs):
+            pages = func(*args, **kwargs)
+            while True:
+                started = time.perf_counter()
+                try:
+                    page = next(pages)
+                except StopIteration:
+                    return
+                finally:
+                    self.record('select_page', time.perf_counter() - started)
+                yield page
+        return wrapper
+
+    def timed_post(self, func):
+        # Время от записи в outbox до ответа Slack.
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            future = func(*args, **kwargs)
+            self.record('outbox_post', time.perf_counter() - started)
+            future.add_done_callback(lambda done: self.record('slack_ack', time.perf_counter() - started))
+            return future
+        return wrapper
+
+    def summary(self):
+        with self._lock:
+            return {stage: _describe(samples) for stage, samples in self.samples.items()}
+
+
+def _describe(samples):
+    ordered = sorted(samples)
+
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+    return {
+        'count': len(ordered),
+        'total_s': sum(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'p50_ms': percentile(0.5),
+        'p99_ms': percentile(0.99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def _questions(cursor):
+    cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+    return int(cursor.fetchone()['Value'])
+
+
+def _prepare_schema(monitor):
+    from db_pool import MYSQL_DB_MERCHANT, db_cursor
+
+    with db_cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MYSQL_DB_MERCHANT}.merchant_data (
+                merchant_id INT PRIMARY KEY,
+                id_merchant VARCHAR(255) NOT NULL
+            )
+        """)
+        cursor.execute(f"TRUNCATE TABLE {TABLES[monitor]}")
+        cursor.execute("TRUNCATE TABLE core.project_transactions")
+        cursor.execute("TRUNCATE TABLE projects")
+        cursor.execute(f"TRUNCATE TABLE {MYSQL_DB_MERCHANT}.merchant_data")
+        cursor.executemany(
+            "INSERT INTO projects (id, name) VALUES (%s, %s)",
+            [(number, f"Project {number}") for number in range(1, BENCH_PROJECTS + 1)],
+        )
+        cursor.executemany(
+            f"INSERT INTO {MYSQL_DB_MERCHANT}.merchant_data (merchant_id, id_merchant) VALUES (%s, %s)",
+            [(number, f"Merchant {number}") for number in range(1, BENCH_MERCHANTS + 1)],
+        )
+
+
+def _seed_rows(cursor, monitor, start, count, created_at):
+    # Суммы уникальны, поэтому каждая строка однозначно сопоставляется с core.project_transactions.
+    rows = []
+    correlations = []
+    for number in range(start, start + count):
+        merchant_id = number % BENCH_MERCHANTS + 1
+        project_id = number % BENCH_PROJECTS + 1
+        amount = f"{number}.12345678"
+        if monitor == 'cashouts':
+            rows.append(('in_progress', amount, 'USDT', merchant_id, project_id, created_at))
+        elif monitor == 'exchange_transactions':
+            rows.append(('in_progress', amount, 'BTC', amount, 'USDT', '1.5', '0.1', merchant_id, project_id, created_at))
+        else:
+            rows.append(('in_progress', amount, 'ETH', '0.90', merchant_id, project_id, created_at))
+        correlations.append((merchant_id, amount, created_at))
+
+    if monitor == 'cashouts':
+        query = f"""
+            INSERT INTO {TABLES[monitor]}
+            (status, amount, currency_network, owner_merchant_id, project_id, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """
+    elif monitor == 'exchange_transactions':
+        query = f"""
+            INSERT INTO {TABLES[monitor]}
+            (status, amount_from, currency_from, amount_to, currency_to, rate, fee_exchange,
+             owner_merchant_id, project_id, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """
+    else:
+        query = f"""
+            INSERT INTO {TABLES[monitor]}
+            (status, amount, currency_name, risk_score, owner_merchant_id, project_id, created_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+
+    for offset in range(0, count, BENCH_INSERT_BATCH):
+        cursor.executemany(query, rows[offset:offset + BENCH_INSERT_BATCH])
+        if monitor != 'exchange_transactions':
+            cursor.executemany(
+                "INSERT INTO core.project_transactions (owner_merchant_id, amount, created_at) VALUES (%s, %s, %s)",
+                correlations[offset:offset + BENCH_INSERT_BATCH],
+            )
+
+
+def _start_monitor(monitor):
+    import importlib
+
+    if monitor == 'deposit_stream':
+        import deposit_stream
+        import risk_score
+        target, args = deposit_stream.monitor_transactions, ([risk_score.subscriber],)
+    else:
+        target, args = importlib.import_module(monitor).monitor_transactions, ()
+    threading.Thread(target=target, args=args, name=monitor, daemon=True).start()
+
+
+def _instrument(timings):
+    import keyset_pages
+    import outbox
+    import project_transactions_data
+    import transaction_stream
+
+    # Цикл опроса у всех мониторов общий, поэтому подменяем имена в transaction_stream.
+    module = transaction_stream
+    module.iter_pages = timings.timed_pages(keyset_pages.iter_pages)
+    module.get_project_names = timings.timed('project_names', module.get_project_names)
+    module.fetch_changed_statuses = timings.timed('status_refresh', module.fetch_changed_statuses)
+    index = project_transactions_data.ProjectTransactionsIndex
+    index.refresh = timings.timed('correlation_refresh', index.refresh)
+    index.find_real_transaction_id = timings.timed('correlation_lookup', index.find_real_transaction_id)
+    outbox.Outbox.post = timings.timed_post(outbox.Outbox.post)
+
+
+def run_scenario(monitor, rows):
+    state_dir = tempfile.mkdtemp(prefix="notify-bench-")
+    _configure_child_env(state_dir)
+
+    from fake_slack import FakeSlack
+
+    fake_slack = FakeSlack().start()
+    os.environ["SLACK_BASE_URL"] = fake_slack.url
+
+    from db_pool import db_cursor
+    from notification_latency import get_notification_latency
+    from poll_interval import poll_intervals
+
+    _prepare_schema(monitor)
+    created_at = datetime.now().replace(microsecond=0) - timedelta(minutes=1)
+    with db_cursor() as cursor:
+        # Строка-затравка: на пустом состоянии монитор стартует с текущего MAX(id).
+        _seed_rows(cursor, monitor, 0, 1, created_at)
+
+    timings = StageTimings()
+    _instrument(timings)
+    _start_monitor(monitor)
+    while monitor not in poll_intervals or not sum(poll_intervals[monitor].metrics.values()):
+        time.sleep(0.05)
+
+    with db_cursor() as cursor:
+        # Одна транзакция: монитор увидит все строки разом, как после простоя.
+        cursor.execute("START TRANSACTION")
+        _seed_rows(cursor, monitor, 1, rows, created_at)
+        cursor.execute("COMMIT")
+        started = time.perf_counter()
+        questions_before = _questions(cursor)
+
+    # По одному сообщению на строку: все депозиты затравки проходят фильтр risk_score.
+    expected = rows
+    deadline = started + BENCH_TIMEOUT
+    while fake_slack.count('chat.postMessage') < expected and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    delivered = fake_slack.count('chat.postMessage')
+
+    with db_cursor() as cursor:
+        queries = _questions(cursor) - questions_before - 1
+
+    return {
+        'monitor': monitor,
+        'rows': rows,
+        'messages': delivered,
+        'expected_messages': expected,
+        'completed': delivered >= expected,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed,
+        'queries': queries,
+        'queries_per_row': queries / rows,
+        'stages': timings.summary(),
+        'notification_latency': get_notification_latency(),
+    }
+
+
+def _print_result(result):
+    status = "" if result['completed'] else f" (TIMEOUT: {result['messages']}/{result['expected_messages']} messages)"
+    print(
+        f"\n{result['monitor']} x {result['rows']}: {result['seconds']:.2f}s, "
+        f"{result['rows_per_second']:.1f} rows/s, {result['queries_per_row']:.3f} queries/row{status}"
+    )
+    print(f"  {'stage':<22}{'count':>9}{'total s':>10}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage, stats in sorted(result['stages'].items()):
+        print(
+            f"  {stage:<22}{stats['count']:>9}{stats['total_s']:>10.2f}{stats['mean_ms']:>10.2f}"
+            f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{stats['max_ms']:>10.2f}"
+        )
+    for monitor, stages in sorted(result['notification_latency'].items()):
+        print(f"  notification latency, {monitor}:")
+        for stage, stats in sorted(stages.items()):
+            print(f"    {stage:<20} p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, p999 {stats['p999_ms']} ms")
+
+
+def _csv(value, cast=str):
+    return [cast(item.strip()) for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark monitors against a local MySQL and a fake Slack")
+    parser.add_argument("--monitors", type=_csv, default=list(BENCH_MONITORS))
+    parser.add_argument("--sizes", type=lambda value: _csv(value, int), default=list(BENCH_SIZES))
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--allow-remote", action="store_true", help="allow a non-local MYSQL_HOST")
+    parser.add_argument("--scenario", nargs=2, metavar=("MONITOR", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        # Мониторы сами печатают в stdout, поэтому результат помечен префиксом.
+        print(RESULT_PREFIX + json.dumps(run_scenario(args.scenario[0], int(args.scenario[1]))), flush=True)
+        return
+
+    unknown = [monitor for monitor in args.monitors if monitor not in BENCH_MONITORS]
+    if unknown:
+        parser.error(f"unknown monitors: {', '.join(unknown)} (available: {', '.join(BENCH_MONITORS)})")
+    if os.environ.get("MYSQL_HOST") not in LOCAL_HOSTS and not args.allow_remote:
+        parser.error("the benchmark truncates transaction tables; run it against a local MySQL or pass --allow-remote")
+
+    results = []
+    for monitor in args.monitors:
+        for rows in args.sizes:
+            child = subprocess.run(
+                [sys.executable, __file__, "--scenario", monitor, str(rows)],
+                stdout=subprocess.PIPE,
+                universal_newlines=True,
+            )
+            if child.returncode != 0:
+                print(f"\n{monitor} x {rows}: scenario failed with exit code {child.returncode}")
+                continue
+            lines = [line for line in child.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+            result = json.loads(lines[-1][len(RESULT_PREFIX):])
+            _print_result(result)
+            results.append(result)
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import time
+from collections import defaultdict
+
+# Если после рестарта накопилось больше строк, чем CATCHUP_MAX_INDIVIDUAL,
+# вместо отдельных сообщений отправляется одна сводка.
+CATCHUP_MAX_INDIVIDUAL = int(os.environ.get("CATCHUP_MAX_INDIVIDUAL", 50))
+# Сводка считается диапазонами id, с паузой между ними, чтобы не грузить базу.
+CATCHUP_ID_RANGE = int(os.environ.get("CATCHUP_ID_RANGE", 5000))
+CATCHUP_RANGE_DELAY = float(os.environ.get("CATCHUP_RANGE_DELAY", 0.2))
+CATCHUP_DIGEST_MAX_LINES = int(os.environ.get("CATCHUP_DIGEST_MAX_LINES", 30))
+
+
+def count_backlog(cursor, table, last_processed_id, condition="1 = 1", params=(), upper_id=None):
+    if upper_id is None:
+        cursor.execute(f"SELECT MAX(id) AS max_id FROM {table}")
+        upper_id = cursor.fetchone()['max_id'] or 0
+
+    cursor.execute(
+        f"SELECT COUNT(*) AS count FROM {table} WHERE id > %s AND id <= %s AND {condition}",
+        (last_processed_id, upper_id) + params,
+    )
+    return upper_id, cursor.fetchone()['count']
+
+
+def summarize_backlog(
+    cursor,
+    table,
+    last_processed_id,
+    amount_column,
+    currency_column,
+    condition="1 = 1",
+    params=(),
+    min_count=CATCHUP_MAX_INDIVIDUAL,
+    upper_id=None,
+):
+    # Возвращает None, если отставание небольшое и его можно разослать как обычно.
+    upper_id, count = count_backlog(cursor, table, last_processed_id, condition, params, upper_id)
+    if count <= min_count:
+        return None
+
+    totals = defaultdict(lambda: {'count': 0, 'amount': 0, 'statuses': defaultdict(int)})
+    range_start = last_processed_id
+    while range_start < upper_id:
+        range_end = min(range_start + CATCHUP_ID_RANGE, upper_id)
+        cursor.execute(
+            f"""
+            SELECT owner_merchant_id, {currency_column} AS currency, status,
+                   COUNT(*) AS count, SUM({amount_column}) AS amount
+            FROM {table}
+            WHERE id > %s AND id <= %s AND {condition}
+            GROUP BY owner_merchant_id, {currency_column}, status
+            """,
+            (range_start, range_end) + params,
+        )
+        for row in cursor.fetchall():
+            entry = totals[(row['owner_merchant_id'], row['currency'])]
+            entry['count'] += row['count']
+            entry['amount'] += row['amount'] or 0
+            entry['statuses'][row['status']] += row['count']
+
+        range_start = range_end
+        if range_start < upper_id:
+            time.sleep(CATCHUP_RANGE_DELAY)
+
+    return {
+        'from_id': last_processed_id,
+        'to_id': upper_id,
+        'count': sum(entry['count'] for entry in totals.values()),
+        'totals': totals,
+    }
+
+
+def format_backlog_digest(title, summary, merchants):
+    lines = [
+        f">*{title}* — catch-up after restart",
+        f":hourglass: {summary['count']} transactions (#{summary['from_id'] + 1} – #{summary['to_id']}) were created while the monitor was down",
+        "",
+    ]
+
+    ordered = sorted(summary['totals'].items(), key=lambda item: item[1]['count'], reverse=True)
+    for (merchant_id, currency), entry in ordered[:CATCHUP_DIGEST_MAX_LINES]:
+        statuses = ", ".join(f"{status}: {count}" for status, count in sorted(entry['statuses'].items()))
+        merchant_name = merchants.get(merchant_id, 'Unknown')
+        lines.append(f"• {merchant_name}: {entry['count']} × {entry['amount']} {currency} ({statuses})")
+
+    if len(ordered) > CATCHUP_DIGEST_MAX_LINES:
+        lines.append(f"…and {len(ordered) - CATCHUP_DIGEST_MAX_LINES} more merchant/currency groups")
+
+    return "\n".join(lines)
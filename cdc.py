@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+
+from db_pool import MYSQL_DB_NAME, MYSQL_HOST, MYSQL_PASSWORD, MYSQL_PORT, MYSQL_USER
+
+load_dotenv()
+
+# Чтение row-based binlog вместо опроса таблиц. Нужны binlog_format=ROW,
+# binlog_row_image=FULL и права REPLICATION SLAVE, REPLICATION CLIENT у пользователя.
+#
+# Проверка на локальном одноразовом mysqld:
+#
+#   mysqld --log-bin=mysql-bin --server-id=1 --binlog-format=ROW --binlog-row-image=FULL
+#   mysql -u root -e "CREATE USER 'notify'@'%' IDENTIFIED BY 'notify';
+#                     GRANT SELECT, REPLICATION SLAVE, REPLICATION CLIENT ON *.* TO 'notify'@'%';"
+#   MYSQL_USER=notify MYSQL_PASSWORD=notify python cdc.py
+#
+# Скрипт сначала проверяет настройки сервера и права (check_server), затем печатает
+# события по таблицам транзакций; строки для них можно вставить через benchmark.py.
+CDC_ENABLED = os.environ.get("CDC_ENABLED", "0") == "1"
+CDC_SERVER_ID = int(os.environ.get("CDC_SERVER_ID", 4242))
+# Даже при работающем CDC раз в столько секунд выполняется полный цикл опроса — страховка от пропусков.
+CDC_FALLBACK_INTERVAL = float(os.environ.get("CDC_FALLBACK_INTERVAL", 60))
+CDC_RECONNECT_DELAY = float(os.environ.get("CDC_RECONNECT_DELAY", 5))
+
+CDC_TABLES = (
+    "project_withdrawal_crypto_transactions",
+    "project_exchange_transactions",
+    "project_deposit_crypto_transactions",
+)
+
+
+class ChangeFeed:
+    # Фоновый поток читает binlog и копит по каждой таблице: были ли вставки
+    # и у каких id сменился статус. Мониторы забирают это через wait().
+
+    def __init__(self, tables=CDC_TABLES):
+        self.tables = tables
+        self.connected = False
+        self.metrics = {'events': 0, 'inserts': 0, 'updates': 0, 'reconnects': 0}
+        self._condition = threading.Condition()
+        self._changes = {table: {'inserted': False, 'updated': set()} for table in tables}
+        self._last_full_cycle = {table: 0 for table in tables}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cdc", daemon=True)
+            self._thread.start()
+
+    def _stream(self):
+        from pymysqlreplication import BinLogStreamReader
+        from pymysqlreplication.row_event import UpdateRowsEvent, WriteRowsEvent
+
+        return BinLogStreamReader(
+            connection_settings={
+                'host': MYSQL_HOST,
+                'port': MYSQL_PORT,
+                'user': MYSQL_USER,
+                'passwd': MYSQL_PASSWORD,
+            },
+            server_id=CDC_SERVER_ID,
+            only_events=[WriteRowsEvent, UpdateRowsEvent],
+            only_schemas=[MYSQL_DB_NAME],
+            only_tables=list(self.tables),
+            blocking=True,
+            resume_stream=True,
+        )
+
+    def _record(self, event):
+        with self._condition:
+            changes = self._changes[event.table]
+            for row in event.rows:
+                self.metrics['events'] += 1
+                if 'values' in row:
+                    changes['inserted'] = True
+                    self.metrics['inserts'] += 1
+                elif row['before_values'].get('status') != row['after_values'].get('status'):
+                    changes['updated'].add(row['after_values']['id'])
+                    self.metrics['updates'] += 1
+            self._condition.notify_all()
+
+    def _run(self):
+        # Позицию binlog не сохраняем: после переподключения ближайший полный цикл
+        # опроса добирает всё, что было пропущено, по водяным знакам.
+        while True:
+            stream = None
+            try:
+                stream = self._stream()
+                with self._condition:
+                    # После (пере)подключения первый цикл каждого монитора — полный опрос.
+                    self._last_full_cycle = {table: 0 for table in self.tables}
+                    self.connected = True
+                for event in stream:
+                    self._record(event)
+            except ImportError:
+                print("CDC disabled: python-mysql-replication is not installed")
+                self.connected = False
+                return
+            except Exception as e:
+                print(f"CDC stream error: {e}")
+            finally:
+                if stream is not None:
+                    stream.close()
+
+            self.connected = False
+            self.metrics['reconnects'] += 1
+            time.sleep(CDC_RECONNECT_DELAY)
+
+    def wait(self, table, timeout):
+        # None — нужен полный цикл опроса (CDC не подключён или пора сделать страховочный проход).
+        # Иначе {'inserted': bool, 'updated': set(id)} — что изменилось с прошлого вызова.
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                changes = self._changes[table]
+                if not self.connected:
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                    self._last_full_cycle[table] = time.monotonic()
+                    self._changes[table] = {'inserted': False, 'updated': set()}
+                    return None
+
+                if time.monotonic() - self._last_full_cycle[table] >= CDC_FALLBACK_INTERVAL:
+                    self._last_full_cycle[table] = time.monotonic()
+                    self._changes[table] = {'inserted': False, 'updated': set()}
+                    return None
+
+                remaining = deadline - time.monotonic()
+                if changes['inserted'] or changes['updated'] or remaining <= 0:
+                    self._changes[table] = {'inserted': False, 'updated': set()}
+                    return changes
+                self._condition.wait(remaining)
+
+
+def check_server(cursor):
+    # Список проблем, из-за которых CDC не увидит изменения; пустой — всё настроено.
+    problems = []
+    for variable, expected in (('log_bin', 'ON'), ('binlog_format', 'ROW'), ('binlog_row_image', 'FULL')):
+        cursor.execute("SHOW VARIABLES LIKE %s", (variable,))
+        row = cursor.fetchone()
+        value = row['Value'] if row else None
+        if value is None or value.upper() != expected:
+            problems.append(f"{variable} is {value}, expected {expected}")
+
+    cursor.execute("SHOW GRANTS")
+    grants = " ".join(str(value) for row in cursor.fetchall() for value in row.values()).upper()
+    if "ALL PRIVILEGES ON *.*" not in grants:
+        for privilege, synonym in (('REPLICATION SLAVE', 'REPLICATION REPLICA'), ('REPLICATION CLIENT', None)):
+            if privilege not in grants and (synonym is None or synonym not in grants):
+                problems.append(f"user {MYSQL_USER} lacks {privilege}")
+    return problems
+
+
+change_feed = ChangeFeed()
+if CDC_ENABLED:
+    change_feed.start()
+
+
+def wait_for_changes(table, timeout):
+    if not CDC_ENABLED:
+        time.sleep(timeout)
+        return None
+    return change_feed.wait(table, timeout)
+
+
+if __name__ == "__main__":
+    # Ручная проверка на локальном mysqld (см. начало файла).
+    from db_pool import db_cursor
+
+    with db_cursor() as cursor:
+        problems = check_server(cursor)
+    if problems:
+        for problem in problems:
+            print(f"CDC check failed: {problem}")
+        raise SystemExit(1)
+
+    change_feed.start()
+    while True:
+        for table in CDC_TABLES:
+            changes = change_feed.wait(table, 1)
+            if changes is not None and (changes['inserted'] or changes['updated']):
+                print(f"{table}: inserted={changes['inserted']} updated={sorted(changes['updated'])}")
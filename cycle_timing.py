@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+import time
+
+from histogram import DEFAULT_BUCKETS, Histogram, format_histogram, parse_buckets
+
+# Границы корзин гистограмм длительности этапов цикла, в секундах.
+CYCLE_TIMING_BUCKETS = parse_buckets(os.environ.get("CYCLE_TIMING_BUCKETS"), DEFAULT_BUCKETS)
+# Как часто печатать сводку по этапам в лог (секунды); 0 — не печатать.
+CYCLE_TIMING_LOG_INTERVAL = float(os.environ.get("CYCLE_TIMING_LOG_INTERVAL", 300))
+
+# monitor -> {stage: Histogram}
+cycle_histograms = {}
+_lock = threading.Lock()
+
+
+class CycleTimer:
+    # Секундомер цикла опроса: lap(stage) добавляет к этапу время с предыдущей отметки.
+    # Этап может встречаться в цикле несколько раз (например, по разу на страницу) —
+    # в гистограмму попадает его суммарное время за цикл.
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.cycles = 0
+        self._stages = {}
+        self._cycle_started = self._last = time.perf_counter()
+        self._last_log = time.monotonic()
+        with _lock:
+            cycle_histograms.setdefault(monitor, {})
+
+    def start(self):
+        self._stages = {}
+        self._cycle_started = self._last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self._stages[stage] = self._stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def finish(self):
+        now = time.perf_counter()
+        self._stages['cycle'] = now - self._cycle_started
+        with _lock:
+            histograms = cycle_histograms[self.monitor]
+            for stage, seconds in self._stages.items():
+                histogram = histograms.get(stage)
+                if histogram is None:
+                    histogram = histograms[stage] = Histogram(CYCLE_TIMING_BUCKETS)
+                histogram.observe(seconds)
+        self.cycles += 1
+
+        if CYCLE_TIMING_LOG_INTERVAL and time.monotonic() - self._last_log >= CYCLE_TIMING_LOG_INTERVAL:
+            self._last_log = time.monotonic()
+            print(json.dumps({'event': 'cycle_timing', 'monitor': self.monitor, 'stages': get_cycle_timing(self.monitor)}))
+
+
+def get_cycle_timing(monitor):
+    with _lock:
+        return {
+            stage: {
+                'count': histogram.count,
+                'mean_ms': round(histogram.sum / histogram.count * 1000, 3) if histogram.count else 0,
+                'p50_ms': round(histogram.quantile(0.5) * 1000, 3),
+                'p99_ms': round(histogram.quantile(0.99) * 1000, 3),
+                'max_ms': round(histogram.max * 1000, 3),
+            }
+            for stage, histogram in cycle_histograms.get(monitor, {}).items()
+        }
+
+
+def format_cycle_metrics():
+    with _lock:
+        samples = [
+            ({'monitor': monitor, 'stage': stage}, histogram)
+            for monitor, histograms in sorted(cycle_histograms.items())
+            for stage, histogram in sorted(histograms.items())
+        ]
+        return format_histogram(
+            "notify_cycle_stage_seconds",
+            "Time spent in each stage of a monitor poll cycle.",
+            samples,
+        )
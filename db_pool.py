@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from mysql.connector import pooling
+from mysql.connector.errors import PoolError
+
+from histogram import Histogram
+
+load_dotenv()
+
+MYSQL_HOST = os.environ["MYSQL_HOST"]
+MYSQL_PORT = int(os.environ["MYSQL_PORT"])
+MYSQL_USER = os.environ["MYSQL_USER"]
+MYSQL_PASSWORD = os.environ["MYSQL_PASSWORD"]
+MYSQL_DB_NAME = os.environ["MYSQL_DB_NAME"]
+MYSQL_DB_MERCHANT = os.environ["MYSQL_DB_MERCHANT"]
+
+MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 5))
+# Сколько секунд ждать свободное соединение, если пул исчерпан.
+MYSQL_POOL_TIMEOUT = float(os.environ.get("MYSQL_POOL_TIMEOUT", 10))
+
+_pools = {}
+_pools_lock = threading.Lock()
+pool_metrics = {}
+# database -> Histogram длительности execute/executemany.
+query_latency = {}
+
+
+def _get_pool(database):
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            # autocommit обязателен: соединение переиспользуется между циклами,
+            # и без него REPEATABLE READ отдавал бы старый снимок таблиц.
+            pool = pooling.MySQLConnectionPool(
+                pool_name=f"notify_{database}",
+                pool_size=MYSQL_POOL_SIZE,
+                pool_reset_session=True,
+                host=MYSQL_HOST,
+                port=MYSQL_PORT,
+                user=MYSQL_USER,
+                password=MYSQL_PASSWORD,
+                database=database,
+                autocommit=True,
+            )
+            _pools[database] = pool
+            pool_metrics[database] = {
+                'acquired': 0,
+                'in_use': 0,
+                'waits': 0,
+                'wait_seconds': 0.0,
+                'max_wait_seconds': 0.0,
+                'timeouts': 0,
+            }
+            query_latency[database] = Histogram()
+        return pool
+
+
+def get_connection(database=MYSQL_DB_NAME):
+    # MySQLConnectionPool сам проверяет соединение (ping) перед выдачей
+    # и переподключает его, если сервер его закрыл.
+    pool = _get_pool(database)
+    metrics = pool_metrics[database]
+    started = time.monotonic()
+    waited = False
+
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except PoolError:
+            if time.monotonic() - started >= MYSQL_POOL_TIMEOUT:
+                with _pools_lock:
+                    metrics['timeouts'] += 1
+                raise
+            waited = True
+            time.sleep(0.05)
+
+    wait_seconds = time.monotonic() - started
+    with _pools_lock:
+        metrics['acquired'] += 1
+        metrics['in_use'] += 1
+        if waited:
+            metrics['waits'] += 1
+            metrics['wait_seconds'] += wait_seconds
+            metrics['max_wait_seconds'] = max(metrics['max_wait_seconds'], wait_seconds)
+    return conn
+
+
+def release_connection(conn, database=MYSQL_DB_NAME):
+    # close() у соединения из пула возвращает его в пул, а не рвёт TCP.
+    conn.close()
+    with _pools_lock:
+        pool_metrics[database]['in_use'] -= 1
+
+
+class TimedCursor:
+    # Курсор, который замеряет длительность запросов; всё остальное передаёт как есть.
+
+    def __init__(self, cursor, database):
+        self._cursor = cursor
+        self._latency = query_latency[database]
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with _pools_lock:
+                self._latency.observe(elapsed)
+
+    def execute(self, *args, **kwargs):
+        return self._timed(self._cursor.execute, *args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        return self._timed(self._cursor.executemany, *args, **kwargs)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@contextmanager
+def db_cursor(database=MYSQL_DB_NAME, dictionary=True):
+    conn = get_connection(database)
+    cursor = conn.cursor(dictionary=dictionary)
+    try:
+        yield TimedCursor(cursor, database)
+    finally:
+        cursor.close()
+        release_connection(conn, database)
+
+
+def get_pool_metrics():
+    with _pools_lock:
+        return {
+            database: dict(metrics, pool_size=MYSQL_POOL_SIZE)
+            for database, metrics in pool_metrics.items()
+        }
+
+
+def get_query_latency():
+    with _pools_lock:
+        return {database: histogram.copy() for database, histogram in query_latency.items()}
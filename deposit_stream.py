@@ -0,0 +1,45 @@
+from transaction_stream import Subscriber, TransactionStream
+
+TRANSACTIONS_TABLE = "project_deposit_crypto_transactions"
+
+# Колонки, которые реально используются в шаблонах и при сопоставлении транзакций.
+DEPOSIT_COLUMNS = (
+    'id',
+    'status',
+    'amount',
+    'currency_name',
+    'risk_score',
+    'owner_merchant_id',
+    'project_id',
+    'created_at',
+)
+
+# Водяной знак общий для всех подписчиков: таблица читается одним запросом на цикл.
+stream = TransactionStream(
+    "deposit_stream",
+    TRANSACTIONS_TABLE,
+    DEPOSIT_COLUMNS,
+    "amount",
+    "currency_name",
+    "deposit",
+)
+
+
+class DepositSubscriber(Subscriber):
+    # Один тип уведомлений о депозитах; render_status получает только статус.
+
+    def __init__(self, name, channel, condition, params, render_message, render_status, title):
+        super().__init__(
+            name,
+            TRANSACTIONS_TABLE,
+            channel,
+            title,
+            render_message,
+            lambda transaction: render_status(transaction['status']),
+            condition,
+            params,
+        )
+
+
+def monitor_transactions(subscribers):
+    stream.run(subscribers)
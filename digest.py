@@ -0,0 +1,37 @@
+import os
+
+# Сводка вместо отдельных сообщений, если за цикл опроса (по всем страницам)
+# пришло столько строк или столько сообщений ещё ждут отправки в очереди доставки.
+DIGEST_ROW_THRESHOLD = int(os.environ.get("DIGEST_ROW_THRESHOLD", 10))
+DIGEST_QUEUE_THRESHOLD = int(os.environ.get("DIGEST_QUEUE_THRESHOLD", 20))
+DIGEST_MAX_LINES = int(os.environ.get("DIGEST_MAX_LINES", 50))
+# Больше строк цикл не держит в памяти до отправки: хвост после простоя
+# уходит несколькими сводками, и водяной знак сдвигается после каждой.
+DIGEST_MAX_ROWS = int(os.environ.get("DIGEST_MAX_ROWS", 5000))
+# Отдельных тредов по транзакциям из сводки нет: смены статусов идут ответами в тред
+# самой сводки с номером транзакции, иначе каждая из них снова стоила бы сообщения в канале.
+
+DIGEST_HEADER = ("ID", "Merchant", "Amount", "Status")
+
+
+def should_digest(row_count, delivery):
+    if row_count < 2:
+        return False
+    return row_count >= DIGEST_ROW_THRESHOLD or delivery.queue_depth() >= DIGEST_QUEUE_THRESHOLD
+
+
+def format_digest(title, lines):
+    # lines: кортежи (id, мерчант, сумма, статус) — выводим таблицей в блоке кода.
+    shown = [tuple(str(value) for value in line) for line in lines[:DIGEST_MAX_LINES]]
+    widths = [max(len(row[column]) for row in [DIGEST_HEADER] + shown) for column in range(len(DIGEST_HEADER))]
+
+    table = [
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in [DIGEST_HEADER] + shown
+    ]
+    if len(lines) > DIGEST_MAX_LINES:
+        table.append(f"…and {len(lines) - DIGEST_MAX_LINES} more")
+
+    return f">*{title}* — {len(lines)} new transactions\n" \
+           f"Status changes are posted in this thread.\n" \
+           f"```\n" + "\n".join(table) + "\n```"
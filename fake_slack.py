@@ -0,0 +1,206 @@
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+# Локальная замена Slack Web API для бенчмарков и нагрузочных прогонов: отвечает на
+# chat.postMessage и chat.update так же, как Slack, с заданной задержкой, ошибками
+# и 429 + Retry-After, и записывает каждый вызов. Мониторы направляются сюда через
+# SLACK_BASE_URL, например SLACK_BASE_URL=http://127.0.0.1:8089/api/.
+FAKE_SLACK_LATENCY = os.environ.get("FAKE_SLACK_LATENCY", "none")
+FAKE_SLACK_RATE_LIMIT = float(os.environ.get("FAKE_SLACK_RATE_LIMIT", 0))
+FAKE_SLACK_RETRY_AFTER = int(os.environ.get("FAKE_SLACK_RETRY_AFTER", 1))
+FAKE_SLACK_ERROR_RATE = float(os.environ.get("FAKE_SLACK_ERROR_RATE", 0))
+FAKE_SLACK_ERROR = os.environ.get("FAKE_SLACK_ERROR", "internal_error")
+FAKE_SLACK_SEED = os.environ.get("FAKE_SLACK_SEED")
+
+
+def parse_latency(spec):
+    # "none", "fixed:50", "uniform:20:80" или "lognormal:50:0.5" (медиана в мс и sigma).
+    # Возвращает функцию random.Random -> задержка в секундах.
+    name, *values = spec.split(":")
+    values = [float(value) for value in values]
+    if name == "none":
+        return lambda rng: 0
+    if name == "fixed":
+        return lambda rng: values[0] / 1000
+    if name == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if name == "lognormal":
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma) / 1000
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+class FakeSlack:
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=FAKE_SLACK_LATENCY,
+        rate_limit=FAKE_SLACK_RATE_LIMIT,
+        retry_after=FAKE_SLACK_RETRY_AFTER,
+        error_rate=FAKE_SLACK_ERROR_RATE,
+        error=FAKE_SLACK_ERROR,
+        seed=FAKE_SLACK_SEED,
+    ):
+        self.latency = parse_latency(latency)
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.error_rate = error_rate
+        self.error = error
+        # Каждый вызов: method, params, status, error, received_at, responded_at.
+        self.calls = []
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self._ts = itertools.count(1)
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+                if self.headers.get('Content-Type', '').startswith('application/json'):
+                    params = json.loads(body or "{}")
+                else:
+                    params = dict(parse_qsl(body))
+                status, headers, payload = fake.handle(self.path.rsplit("/", 1)[-1], params)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _respond(self, method, params):
+        with self._lock:
+            roll = self._random.random()
+            delay = self.latency(self._random)
+            ts = f"{int(time.time())}.{next(self._ts):06d}"
+        time.sleep(delay)
+
+        if roll < self.rate_limit:
+            return 429, {'Retry-After': str(self.retry_after)}, {'ok': False, 'error': 'ratelimited'}
+        if roll < self.rate_limit + self.error_rate:
+            return 200, {}, {'ok': False, 'error': self.error}
+
+        channel = params.get('channel')
+        if method == 'chat.postMessage':
+            if not channel:
+                return 200, {}, {'ok': False, 'error': 'channel_not_found'}
+            if not params.get('text') and not params.get('blocks'):
+                return 200, {}, {'ok': False, 'error': 'no_text'}
+            message = {'type': 'message', 'text': params.get('text'), 'ts': ts}
+            if params.get('thread_ts'):
+                message['thread_ts'] = params['thread_ts']
+            return 200, {}, {'ok': True, 'channel': channel, 'ts': ts, 'message': message}
+        if method == 'chat.update':
+            if not channel or not params.get('ts'):
+                return 200, {}, {'ok': False, 'error': 'message_not_found'}
+            return 200, {}, {'ok': True, 'channel': channel, 'ts': params['ts'], 'text': params.get('text')}
+        return 404, {}, {'ok': False, 'error': 'unknown_method'}
+
+    def handle(self, method, params):
+        received_at = time.time()
+        status, headers, payload = self._respond(method, params)
+        with self._lock:
+            self.calls.append({
+                'method': method,
+                'params': params,
+                'status': status,
+                'error': payload.get('error'),
+                'received_at': received_at,
+                'responded_at': time.time(),
+            })
+            if payload.get('ok'):
+                self.counts[method] += 1
+        return status, headers, payload
+
+    def count(self, method):
+        # Сколько вызовов method завершилось успешно.
+        with self._lock:
+            return self.counts[method]
+
+    def calls_for(self, method=None, **params):
+        # Записанные вызовы с заданным методом и значениями параметров, например calls_for('chat.postMessage', channel='C1').
+        with self._lock:
+            return [
+                call for call in self.calls
+                if (method is None or call['method'] == method)
+                and all(call['params'].get(name) == value for name, value in params.items())
+            ]
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+            self.counts = Counter()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-slack", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Slack Web API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default=FAKE_SLACK_LATENCY, help="none, fixed:MS, uniform:MIN:MAX or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--rate-limit", type=float, default=FAKE_SLACK_RATE_LIMIT, help="share of calls answered with 429")
+    parser.add_argument("--retry-after", type=int, default=FAKE_SLACK_RETRY_AFTER)
+    parser.add_argument("--error-rate", type=float, default=FAKE_SLACK_ERROR_RATE, help="share of calls answered with ok=false")
+    parser.add_argument("--error", default=FAKE_SLACK_ERROR)
+    parser.add_argument("--seed", default=FAKE_SLACK_SEED)
+    args = parser.parse_args()
+
+    fake = FakeSlack(
+        args.host,
+        args.port,
+        latency=args.latency,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate,
+        error=args.error,
+        seed=args.seed,
+    ).start()
+    print(f"Fake Slack listening on {fake.url}")
+
+    try:
+        while True:
+            time.sleep(10)
+            statuses = Counter((call['method'], call['status']) for call in fake.calls_for())
+            print(", ".join(f"{method} {status}: {count}" for (method, status), count in sorted(statuses.items())))
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import bisect
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def parse_buckets(value, default=DEFAULT_BUCKETS):
+    # "0.01,0.1,1" -> (0.01, 0.1, 1.0); пустое значение — default.
+    if not value:
+        return default
+    return tuple(sorted(float(bound) for bound in value.split(",")))
+
+
+class Histogram:
+    # Кумулятивные корзины в духе Prometheus; квантили оцениваются по верхней границе корзины.
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.count = self.count
+        histogram.sum = self.sum
+        histogram.max = self.max
+        return histogram
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def cumulative(self):
+        # [(граница, число наблюдений <= границы)] плюс +Inf.
+        result = []
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            result.append((bound, seen))
+        return result
+
+
+def format_labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def format_histogram(name, help_text, samples):
+    # samples: [(labels, Histogram)] -> текст в формате Prometheus.
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in samples:
+        prefix = format_labels(labels)
+        separator = "," if prefix else ""
+        for bound, count in histogram.cumulative():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{name}_bucket{{{prefix}{separator}le="{le}"}} {count}')
+        suffix = f"{{{prefix}}}" if prefix else ""
+        lines.append(f"{name}_sum{suffix} {histogram.sum}")
+        lines.append(f"{name}_count{suffix} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+class HdrHistogram:
+    # Лог-линейная гистограмма в духе HdrHistogram: значения (целые миллисекунды) меньше
+    # 2 ** sub_bucket_bits хранятся точно, дальше на каждую степень двойки приходится
+    # 2 ** (sub_bucket_bits - 1) корзин, так что относительная ошибка не больше 2 ** (1 - sub_bucket_bits).
+
+    def __init__(self, sub_bucket_bits=7):
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.half = self.sub_buckets // 2
+        self.bits = sub_bucket_bits
+        self.counts = {}
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def _index(self, value):
+        if value < self.sub_buckets:
+            return value
+        shift = value.bit_length() - self.bits
+        return shift * self.half + (value >> shift)
+
+    def _upper(self, index):
+        # Наибольшее значение, попадающее в корзину.
+        if index < self.sub_buckets:
+            return index
+        shift = index // self.half - 1
+        mantissa = index - shift * self.half
+        return ((mantissa + 1) << shift) - 1
+
+    def observe(self, milliseconds):
+        value = max(0, int(milliseconds))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, fraction):
+        if not self.count:
+            return 0
+        rank = fraction * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
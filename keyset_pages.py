@@ -0,0 +1,26 @@
+import os
+
+# Новые строки читаются страницами по возрастанию id, чтобы после простоя
+# не поднимать в память весь накопившийся хвост таблицы.
+POLL_PAGE_SIZE = int(os.environ.get("POLL_PAGE_SIZE", 500))
+POLL_FETCH_SIZE = int(os.environ.get("POLL_FETCH_SIZE", 100))
+
+
+def iter_pages(cursor, query, params, last_id, page_size=POLL_PAGE_SIZE):
+    # query заканчивается условием "id > %s"; params — параметры, стоящие перед ним.
+    # Страница отдаётся целиком: вызывающий код обрабатывает её и сдвигает водяной знак
+    # на id последней строки, прежде чем читать следующую.
+    while True:
+        cursor.execute(f"{query} ORDER BY id ASC LIMIT {int(page_size)}", tuple(params) + (last_id or 0,))
+        page = []
+        while True:
+            rows = cursor.fetchmany(POLL_FETCH_SIZE)
+            if not rows:
+                break
+            page.extend(rows)
+
+        if page:
+            yield page
+            last_id = page[-1]['id']
+        if len(page) < page_size:
+            return
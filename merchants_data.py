@@ -1,39 +1,151 @@
 import os
-import mysql.connector
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Замените значения переменных на ваши настройки для базы данных "auth"
-MYSQL_HOST = os.environ["MYSQL_HOST"]
-MYSQL_PORT = int(os.environ["MYSQL_PORT"])
-MYSQL_USER = os.environ["MYSQL_USER"]
-MYSQL_PASSWORD = os.environ["MYSQL_PASSWORD"]
-MYSQL_DB_MERCHANT = os.environ["MYSQL_DB_MERCHANT"]
-
-def create_auth_db_connection():
-    return mysql.connector.connect(
-        host=MYSQL_HOST,
-        port=MYSQL_PORT,
-        user=MYSQL_USER,
-        password=MYSQL_PASSWORD,
-        database=MYSQL_DB_MERCHANT,
-    )
+import threading
+import time
 
-def get_merchants_data():
-    conn = create_auth_db_connection()
-    cursor = conn.cursor(dictionary=True)
+from db_pool import MYSQL_DB_MERCHANT, db_cursor
+
+# Справочник мерчантов загружается один раз, дальше в фоне дочитываются только новые строки
+# (merchant_id или, например, updated_at больше последнего виденного значения).
+MERCHANT_REFRESH_INTERVAL = float(os.environ.get("MERCHANT_REFRESH_INTERVAL", 60))
+MERCHANT_REFRESH_COLUMN = os.environ.get("MERCHANT_REFRESH_COLUMN", "merchant_id")
+# Полная перезагрузка подхватывает переименования, если колонка обновления их не отражает.
+MERCHANT_FULL_REFRESH_INTERVAL = float(os.environ.get("MERCHANT_FULL_REFRESH_INTERVAL", 3600))
+# Сколько секунд помнить, что мерчанта с таким id нет, прежде чем спросить базу снова.
+MERCHANT_NEGATIVE_TTL = float(os.environ.get("MERCHANT_NEGATIVE_TTL", 300))
+
+
+class MerchantDirectory:
+    # merchant_id -> id_merchant. Интерфейс как у словаря из get(), поэтому
+    # шаблоны сообщений и сводки работают с ним так же, как раньше.
+
+    def __init__(self):
+        self._names = {}
+        self._unknown = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._last_value = None
+        self._loaded_at = 0
+        self._thread = None
+        self.metrics = {'hits': 0, 'misses': 0, 'negative_hits': 0, 'lookups': 0, 'refreshes': 0}
+
+    def _columns(self):
+        columns = ['merchant_id', 'id_merchant']
+        if MERCHANT_REFRESH_COLUMN not in columns:
+            columns.append(MERCHANT_REFRESH_COLUMN)
+        return ", ".join(columns)
+
+    def refresh(self, full=False):
+        query = f"SELECT {self._columns()} FROM merchant_data"
+        params = ()
+        if not full and self._last_value is not None:
+            # >=, а не >: при обновлении по времени несколько строк могут иметь одно значение.
+            query += f" WHERE {MERCHANT_REFRESH_COLUMN} >= %s"
+            params = (self._last_value,)
+
+        with db_cursor(MYSQL_DB_MERCHANT) as cursor:
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+
+        with self._lock:
+            if full:
+                self._names = {}
+                self._loaded_at = time.monotonic()
+            for row in result:
+                self._names[row['merchant_id']] = row['id_merchant']
+                self._unknown.pop(row['merchant_id'], None)
+                value = row[MERCHANT_REFRESH_COLUMN]
+                if value is not None and (self._last_value is None or value > self._last_value):
+                    self._last_value = value
+            self.metrics['refreshes'] += 1
+
+    def _run(self):
+        while True:
+            time.sleep(MERCHANT_REFRESH_INTERVAL)
+            try:
+                self.refresh(full=time.monotonic() - self._loaded_at >= MERCHANT_FULL_REFRESH_INTERVAL)
+            except Exception as e:
+                print(f"Error refreshing merchant data: {e}")
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self.refresh(full=True)
+            self._thread = threading.Thread(target=self._run, name="merchants", daemon=True)
+            self._thread.start()
 
-    query = "SELECT merchant_id, id_merchant FROM merchant_data"
-    cursor.execute(query)
-    result = cursor.fetchall()
+    def _lookup(self, merchant_id):
+        # Один запрос на id, даже если его одновременно ждут несколько мониторов.
+        with self._lock:
+            event = self._in_flight.get(merchant_id)
+            owner = event is None
+            if owner:
+                event = self._in_flight[merchant_id] = threading.Event()
 
-    merchant_data = {row['merchant_id']: row['id_merchant'] for row in result}
+        if not owner:
+            event.wait()
+            with self._lock:
+                return self._names.get(merchant_id)
+
+        row = failed = None
+        try:
+            with db_cursor(MYSQL_DB_MERCHANT) as cursor:
+                cursor.execute(
+                    "SELECT merchant_id, id_merchant FROM merchant_data WHERE merchant_id = %s",
+                    (merchant_id,),
+                )
+                row = cursor.fetchone()
+        except Exception as e:
+            print(f"Error looking up merchant {merchant_id}: {e}")
+            failed = True
+
+        with self._lock:
+            self.metrics['lookups'] += 1
+            # Ошибку базы не запоминаем как «мерчанта нет» — спросим снова на следующей строке.
+            if row is None and not failed:
+                self._unknown[merchant_id] = time.monotonic() + MERCHANT_NEGATIVE_TTL
+            elif row is not None:
+                self._names[merchant_id] = row['id_merchant']
+            del self._in_flight[merchant_id]
+        event.set()
+        return None if row is None else row['id_merchant']
+
+    def get(self, merchant_id, default=None):
+        if merchant_id is None:
+            return default
+
+        with self._lock:
+            name = self._names.get(merchant_id)
+            if name is not None:
+                self.metrics['hits'] += 1
+                return name
+            if merchant_id in self._unknown:
+                if self._unknown[merchant_id] > time.monotonic():
+                    self.metrics['negative_hits'] += 1
+                    return default
+                del self._unknown[merchant_id]
+            self.metrics['misses'] += 1
+
+        name = self._lookup(merchant_id)
+        return default if name is None else name
+
+    def get_metrics(self):
+        with self._lock:
+            return dict(self.metrics, size=len(self._names), unknown=len(self._unknown))
+
+
+merchant_directory = MerchantDirectory()
+
+
+def get_merchants_data():
+    # Справочник общий для всех мониторов процесса; фоновое обновление стартует при первом вызове.
+    merchant_directory.start()
+    return merchant_directory
 
-    cursor.close()
-    conn.close()
 
-    return merchant_data
+def get_merchant_cache_metrics():
+    return merchant_directory.get_metrics()
 
 # def print_merchants_data():
 #     merchants_data = get_merchants_data()
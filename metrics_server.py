@@ -0,0 +1,220 @@
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cdc import CDC_ENABLED, change_feed
+from cycle_timing import format_cycle_metrics
+from db_pool import db_cursor, get_pool_metrics, get_query_latency
+from histogram import format_histogram, format_labels
+from merchants_data import get_merchant_cache_metrics
+from monitor_health import check_liveness, get_loops
+from notification_latency import format_latency_metrics
+from outbox import get_outbox_metrics
+from poll_interval import get_poll_interval_metrics
+from project_cache import get_project_cache_metrics
+from slack_delivery import slack_delivery
+
+# HTTP-эндпоинт с метриками процесса (/metrics) и проверкой живости (/health); 0 — не запускать.
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 9108))
+METRICS_HOST = os.environ.get("METRICS_HOST", "0.0.0.0")
+
+
+def format_metric(name, metric_type, help_text, samples):
+    # samples: [(labels, value)] -> текст в формате Prometheus.
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        prefix = format_labels(labels)
+        lines.append(f"{name}{{{prefix}}} {value}" if prefix else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _table_max_ids(tables):
+    max_ids = {}
+    with db_cursor() as cursor:
+        for table in tables:
+            cursor.execute(f"SELECT MAX(id) AS max_id FROM {table}")
+            max_ids[table] = cursor.fetchone()['max_id'] or 0
+    return max_ids
+
+
+def format_loop_metrics():
+    loops = get_loops()
+    _, ages = check_liveness()
+    try:
+        max_ids = _table_max_ids({loop['table'] for loop in loops.values()})
+    except Exception as e:
+        # Без базы отставание не посчитать, но остальные метрики циклов всё равно отдаём.
+        print(f"Error reading table max ids for metrics: {e}")
+        max_ids = {}
+
+    lag = []
+    watermarks = []
+    cycles = []
+    since_cycle = []
+    tracked = []
+    evictions = []
+    for monitor, loop in sorted(loops.items()):
+        labels = {'monitor': monitor, 'table': loop['table']}
+        if loop['last_processed_id'] is not None:
+            if loop['table'] in max_ids:
+                lag.append((labels, max(0, max_ids[loop['table']] - loop['last_processed_id'])))
+            watermarks.append((labels, loop['last_processed_id']))
+        cycles.append(({'monitor': monitor}, loop['cycles']))
+        if ages[monitor] is not None:
+            since_cycle.append(({'monitor': monitor}, ages[monitor]))
+        for name, transactions in sorted(loop['tracked'].items()):
+            metrics = transactions.get_metrics()
+            tracked.append(({'monitor': name}, metrics['size']))
+            for reason in ('terminal', 'expired', 'overflow'):
+                evictions.append(({'monitor': name, 'reason': reason}, metrics[f'evicted_{reason}']))
+
+    return "".join([
+        format_metric("notify_lag_rows", "gauge", "MAX(id) in the table minus the monitor's last processed id.", lag),
+        format_metric("notify_last_processed_id", "gauge", "Watermark of the monitor.", watermarks),
+        format_metric("notify_cycles_total", "counter", "Completed poll cycles.", cycles),
+        format_metric("notify_seconds_since_last_cycle", "gauge", "Seconds since the last completed poll cycle.", since_cycle),
+        format_metric("notify_tracked_transactions", "gauge", "Transactions waiting for a status change.", tracked),
+        format_metric("notify_tracked_evictions_total", "counter", "Transactions dropped from tracking.", evictions),
+    ])
+
+
+def format_slack_metrics():
+    metrics, latency = slack_delivery.get_metrics()
+    return "".join([
+        format_metric("notify_slack_queue_depth", "gauge", "Messages waiting in the delivery queues.", [({}, metrics['queue_depth'])]),
+        format_metric(
+            "notify_slack_messages_total",
+            "counter",
+            "Messages handled by the delivery queue.",
+            [({'result': 'sent'}, metrics['sent']), ({'result': 'failed'}, metrics['failed'])],
+        ),
+        format_metric("notify_slack_rate_limited_total", "counter", "Slack 429 responses.", [({}, metrics['rate_limited'])]),
+        format_histogram("notify_slack_send_seconds", "Duration of a single chat.postMessage call.", [({}, latency)]),
+    ])
+
+
+def format_outbox_metrics():
+    outboxes = sorted(get_outbox_metrics().items())
+    return "".join([
+        format_metric(
+            "notify_outbox_unacked",
+            "gauge",
+            "Outbox messages still waiting for a Slack ts.",
+            [({'monitor': monitor}, metrics['unacked']) for monitor, metrics in outboxes],
+        ),
+        format_metric(
+            "notify_outbox_given_up_total",
+            "counter",
+            "Outbox messages dropped after OUTBOX_MAX_ATTEMPTS failed sends.",
+            [({'monitor': monitor}, metrics['gave_up']) for monitor, metrics in outboxes],
+        ),
+    ])
+
+
+def format_db_metrics():
+    pools = sorted(get_pool_metrics().items())
+    latency = get_query_latency()
+
+    def samples(key):
+        return [({'database': database}, metrics[key]) for database, metrics in pools]
+
+    return "".join([
+        format_histogram(
+            "notify_db_query_seconds",
+            "Duration of cursor.execute calls.",
+            [({'database': database}, latency[database]) for database, _ in pools if database in latency],
+        ),
+        format_metric("notify_db_pool_in_use", "gauge", "Connections checked out of the pool.", samples('in_use')),
+        format_metric("notify_db_pool_size", "gauge", "Pool size.", samples('pool_size')),
+        format_metric("notify_db_pool_waits_total", "counter", "Acquisitions that had to wait.", samples('waits')),
+        format_metric("notify_db_pool_timeouts_total", "counter", "Acquisitions that timed out.", samples('timeouts')),
+    ])
+
+
+def format_cache_metrics():
+    caches = {'project': get_project_cache_metrics(), 'merchant': get_merchant_cache_metrics()}
+    requests = []
+    ratios = []
+    sizes = []
+    for cache, metrics in sorted(caches.items()):
+        hits = metrics['hits'] + metrics.get('negative_hits', 0)
+        requests.append(({'cache': cache, 'result': 'hit'}, hits))
+        requests.append(({'cache': cache, 'result': 'miss'}, metrics['misses']))
+        total = hits + metrics['misses']
+        ratios.append(({'cache': cache}, round(hits / total, 6) if total else 0))
+        sizes.append(({'cache': cache}, metrics['size']))
+    return "".join([
+        format_metric("notify_cache_requests_total", "counter", "Cache lookups by result.", requests),
+        format_metric("notify_cache_hit_ratio", "gauge", "Share of cache lookups served from memory since start.", ratios),
+        format_metric("notify_cache_size", "gauge", "Entries in the cache.", sizes),
+    ])
+
+
+def format_poll_metrics():
+    samples = [({'monitor': monitor}, metrics['interval']) for monitor, metrics in sorted(get_poll_interval_metrics().items())]
+    parts = [format_metric("notify_poll_interval_seconds", "gauge", "Current pause between poll cycles.", samples)]
+    if CDC_ENABLED:
+        parts.append(format_metric("notify_cdc_connected", "gauge", "1 if the binlog stream is connected.", [({}, int(change_feed.connected))]))
+        parts.append(format_metric(
+            "notify_cdc_events_total",
+            "counter",
+            "Binlog row events by kind.",
+            [({'kind': kind}, value) for kind, value in sorted(change_feed.metrics.items())],
+        ))
+    return "".join(parts)
+
+
+# Функции, каждая из которых возвращает кусок текста в формате Prometheus.
+collectors = [
+    format_loop_metrics,
+    format_slack_metrics,
+    format_outbox_metrics,
+    format_db_metrics,
+    format_cache_metrics,
+    format_poll_metrics,
+    format_cycle_metrics,
+    format_latency_metrics,
+]
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def _reply(self, status, body, content_type="text/plain; version=0.0.4; charset=utf-8"):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0]
+        if path == "/health":
+            alive, ages = check_liveness()
+            body = json.dumps({'status': 'ok' if alive else 'stale', 'seconds_since_last_cycle': ages})
+            self._reply(200 if alive else 503, body + "\n", "application/json")
+            return
+        if path != "/metrics":
+            self._reply(404, "not found\n")
+            return
+        parts = []
+        for collect in collectors:
+            try:
+                parts.append(collect())
+            except Exception as e:
+                print(f"Error collecting metrics: {e}")
+        self._reply(200, "".join(parts))
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"Metrics available on http://{host}:{port}/metrics")
+    return server
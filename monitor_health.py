@@ -0,0 +1,60 @@
+import os
+import threading
+import time
+
+# Цикл, который не завершался дольше этого (секунды), считается зависшим.
+HEALTH_MAX_CYCLE_AGE = float(os.environ.get("HEALTH_MAX_CYCLE_AGE", 180))
+# Сколько дать монитору на старт и догонку отставания до первого завершённого цикла.
+HEALTH_STARTUP_GRACE = float(os.environ.get("HEALTH_STARTUP_GRACE", 600))
+
+# monitor -> {'table', 'tracked', 'registered_at', 'last_cycle_at', 'last_processed_id', 'cycles'}
+monitor_loops = {}
+_lock = threading.Lock()
+
+
+def register_loop(monitor, table, tracked):
+    # tracked: {имя: TrackedTransactions} — размер карты отслеживания снимается при сборе метрик.
+    # Время регистрации не сбрасывается при перезапуске, иначе падающий
+    # в цикле монитор навсегда оставался бы в пределах стартовой паузы.
+    with _lock:
+        loop = monitor_loops.get(monitor)
+        if loop is None:
+            loop = monitor_loops[monitor] = {
+                'registered_at': time.monotonic(),
+                'last_cycle_at': None,
+                'last_processed_id': None,
+                'cycles': 0,
+            }
+        loop['table'] = table
+        loop['tracked'] = tracked
+
+
+def report_cycle(monitor, last_processed_id):
+    with _lock:
+        loop = monitor_loops[monitor]
+        loop['last_cycle_at'] = time.monotonic()
+        loop['last_processed_id'] = last_processed_id
+        loop['cycles'] += 1
+
+
+def check_liveness():
+    # (живы ли все циклы, {monitor: секунд с последнего цикла или None})
+    now = time.monotonic()
+    alive = True
+    ages = {}
+    with _lock:
+        for monitor, loop in monitor_loops.items():
+            if loop['last_cycle_at'] is None:
+                ages[monitor] = None
+                if now - loop['registered_at'] > HEALTH_STARTUP_GRACE:
+                    alive = False
+            else:
+                ages[monitor] = round(now - loop['last_cycle_at'], 3)
+                if ages[monitor] > HEALTH_MAX_CYCLE_AGE:
+                    alive = False
+    return alive, ages
+
+
+def get_loops():
+    with _lock:
+        return {monitor: dict(loop) for monitor, loop in monitor_loops.items()}
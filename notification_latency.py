@@ -0,0 +1,91 @@
+import os
+import threading
+import time
+
+from histogram import HdrHistogram
+
+# Задержка уведомления от created_at строки до ответа Slack, по этапам:
+# created_to_seen — строка попала в выборку опроса, created_to_enqueued — сообщение
+# записано в outbox и поставлено в очередь, created_to_acked — Slack вернул ts;
+# seen_to_acked — та же цепочка без учёта того, когда строка появилась в базе.
+# created_at сравнивается с локальными часами процесса, поэтому TZ контейнера
+# должна совпадать с часовым поясом, в котором база пишет created_at.
+NOTIFICATION_LATENCY_PRECISION_BITS = int(os.environ.get("NOTIFICATION_LATENCY_PRECISION_BITS", 7))
+NOTIFICATION_LATENCY_QUANTILES = {"p50": 0.5, "p99": 0.99, "p999": 0.999}
+
+# monitor -> {stage: HdrHistogram}
+latency_histograms = {}
+_lock = threading.Lock()
+
+
+def _observe(monitor, stage, seconds):
+    with _lock:
+        histograms = latency_histograms.setdefault(monitor, {})
+        histogram = histograms.get(stage)
+        if histogram is None:
+            histogram = histograms[stage] = HdrHistogram(NOTIFICATION_LATENCY_PRECISION_BITS)
+        histogram.observe(seconds * 1000)
+
+
+def mark_seen(rows):
+    # Время, когда опрос впервые увидел строку; повторные попытки (pending) его не сдвигают.
+    now = time.time()
+    for row in rows:
+        row.setdefault('seen_at', now)
+
+
+def record_enqueued(monitor, row, ts):
+    # ts — Future от outbox; отметка ack ставится, когда Slack ответит.
+    enqueued_at = time.time()
+    created_at = row.get('created_at')
+    created = created_at.timestamp() if created_at is not None else None
+    seen = row.get('seen_at')
+
+    if created is not None:
+        if seen is not None:
+            _observe(monitor, 'created_to_seen', seen - created)
+        _observe(monitor, 'created_to_enqueued', enqueued_at - created)
+
+    def acked(done):
+        if done.result() is None:
+            return
+        acked_at = time.time()
+        if created is not None:
+            _observe(monitor, 'created_to_acked', acked_at - created)
+        if seen is not None:
+            _observe(monitor, 'seen_to_acked', acked_at - seen)
+
+    ts.add_done_callback(acked)
+
+
+def get_notification_latency():
+    # {monitor: {stage: {'count', 'p50_ms', 'p99_ms', 'p999_ms', 'max_ms'}}}
+    with _lock:
+        return {
+            monitor: {
+                stage: dict(
+                    {f"{label}_ms": histogram.quantile(quantile) for label, quantile in NOTIFICATION_LATENCY_QUANTILES.items()},
+                    count=histogram.count,
+                    max_ms=histogram.max,
+                )
+                for stage, histogram in histograms.items()
+            }
+            for monitor, histograms in latency_histograms.items()
+        }
+
+
+def format_latency_metrics():
+    name = "notify_notification_latency_seconds"
+    lines = [
+        f"# HELP {name} Delay from the row's created_at (or first poll) to each delivery stage.",
+        f"# TYPE {name} summary",
+    ]
+    with _lock:
+        for monitor, histograms in sorted(latency_histograms.items()):
+            for stage, histogram in sorted(histograms.items()):
+                labels = f'monitor="{monitor}",stage="{stage}"'
+                for quantile in NOTIFICATION_LATENCY_QUANTILES.values():
+                    lines.append(f'{name}{{{labels},quantile="{quantile}"}} {histogram.quantile(quantile) / 1000}')
+                lines.append(f"{name}_sum{{{labels}}} {histogram.sum / 1000}")
+                lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+from state_store import STATE_DB_PATH
+
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", 5))
+# Как часто повторно отправлять неподтверждённые сообщения (секунды).
+OUTBOX_DRAIN_INTERVAL = float(os.environ.get("OUTBOX_DRAIN_INTERVAL", 60))
+# Сколько хранить подтверждённые сообщения — по ним работает дедупликация и поиск треда.
+OUTBOX_RETENTION = float(os.environ.get("OUTBOX_RETENTION", 8 * 24 * 3600))
+
+# monitor -> Outbox
+outboxes = {}
+_registry_lock = threading.Lock()
+
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        monitor TEXT NOT NULL,
+        source_table TEXT NOT NULL,
+        transaction_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        is_reply INTEGER NOT NULL,
+        channel TEXT NOT NULL,
+        text TEXT NOT NULL,
+        ts TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        parent_table TEXT,
+        parent_id INTEGER,
+        PRIMARY KEY (monitor, source_table, transaction_id, is_reply, status)
+    )
+"""
+_KEY_CLAUSE = "monitor = ? AND source_table = ? AND transaction_id = ? AND is_reply = ? AND status = ?"
+
+
+class Outbox:
+    # Сообщение сначала записывается в outbox с ключом (таблица, id транзакции, ответ ли, статус),
+    # потом уходит в очередь доставки, а ts ответа Slack подтверждает запись.
+    # Повтор с тем же ключом не отправляется второй раз; неподтверждённые записи
+    # (например, после падения процесса) досылаются в drain().
+    # Статус различает только ответы в треде: сообщение верхнего уровня у транзакции одно,
+    # с каким бы статусом её строку ни перечитали, поэтому в ключе у него пустой статус.
+
+    def __init__(self, monitor, delivery, path=STATE_DB_PATH):
+        self.monitor = monitor
+        self.delivery = delivery
+        # RLock: ack может выполниться сразу внутри post(), если Future уже готов.
+        self._lock = threading.RLock()
+        self._in_flight = {}
+        self._last_drain = 0
+        # gave_up — сообщения, от которых отказались после OUTBOX_MAX_ATTEMPTS неудачных попыток.
+        self.metrics = {'gave_up': 0}
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA.format(table="outbox"))
+        # parent_table/parent_id — ключ родителя ответа, если это не сообщение той же транзакции
+        # (например, сводка). Базы, созданные раньше, получают колонки здесь.
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")]
+        for column, column_type in (('parent_table', 'TEXT'), ('parent_id', 'INTEGER')):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {column_type}")
+        self._migrate_key()
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_unacked ON outbox (monitor, ts, attempts)"
+        )
+        with _registry_lock:
+            outboxes[monitor] = self
+
+    def _migrate_key(self):
+        # Раньше ключом был (таблица, id, статус) без is_reply: ответ совпадал с родителем
+        # того же статуса, а сообщение верхнего уровня уходило заново при смене статуса.
+        # Первичный ключ в SQLite не меняется, поэтому таблица пересоздаётся; из дублей
+        # верхнего уровня остаётся подтверждённый.
+        key_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)") if row[5]]
+        if 'is_reply' in key_columns:
+            return
+
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            key_columns = [row[1] for row in self._conn.execute("PRAGMA table_info(outbox)") if row[5]]
+            if 'is_reply' not in key_columns:
+                self._conn.execute(_SCHEMA.format(table="outbox_migrated"))
+                self._conn.execute("""
+                    INSERT OR IGNORE INTO outbox_migrated
+                    SELECT monitor, source_table, transaction_id, CASE WHEN is_reply THEN status ELSE '' END,
+                           is_reply, channel, text, ts, attempts, created_at, parent_table, parent_id
+                    FROM outbox ORDER BY ts IS NULL, created_at
+                """)
+                self._conn.execute("DROP TABLE outbox")
+                self._conn.execute("ALTER TABLE outbox_migrated RENAME TO outbox")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _parent_ts(self, source_table, transaction_id):
+        # Future родителя, если он ещё в полёте, иначе сохранённый ts.
+        key = (source_table, transaction_id, 0, '')
+        if key in self._in_flight:
+            return self._in_flight[key]
+        row = self._conn.execute(
+            f"SELECT ts FROM outbox WHERE {_KEY_CLAUSE}", (self.monitor,) + key
+        ).fetchone()
+        return row[0] if row else None
+
+    def _record_failure(self, key):
+        source_table, transaction_id, reply, status = key
+        self._conn.execute(
+            f"UPDATE outbox SET attempts = attempts + 1 WHERE {_KEY_CLAUSE}", (self.monitor,) + key
+        )
+        row = self._conn.execute(
+            f"SELECT attempts FROM outbox WHERE {_KEY_CLAUSE}", (self.monitor,) + key
+        ).fetchone()
+        if row is not None and row[0] >= OUTBOX_MAX_ATTEMPTS:
+            print(
+                f"Giving up on Slack {'reply ' + status if reply else 'message'} for {self.monitor} "
+                f"({source_table} #{transaction_id}) after {row[0]} attempts"
+            )
+            self.metrics['gave_up'] += 1
+
+    def _send(self, key, channel, text, thread_ts):
+        _, transaction_id, reply, _ = key
+        if reply and thread_ts is None:
+            # У родителя нет ts и он не в полёте: ответ без треда ушёл бы отдельным сообщением.
+            # Это считается неудачной попыткой — если родителя бросили, ответ тоже
+            # будет брошен после OUTBOX_MAX_ATTEMPTS, а не останется неподтверждённым навсегда.
+            self._record_failure(key)
+            future = Future()
+            future.set_result(None)
+            return future
+        future = self.delivery.post_message(
+            channel,
+            text,
+            thread_ts=thread_ts,
+            ordering_key=(channel, transaction_id),
+        )
+        self._in_flight[key] = future
+
+        def ack(done):
+            ts = done.result()
+            with self._lock:
+                self._in_flight.pop(key, None)
+                if ts is None:
+                    self._record_failure(key)
+                else:
+                    self._conn.execute(
+                        f"UPDATE outbox SET ts = ? WHERE {_KEY_CLAUSE}", (ts, self.monitor) + key
+                    )
+
+        future.add_done_callback(ack)
+        return future
+
+    def post(self, source_table, transaction_id, status, channel, text, reply=False, thread_ts=None, parent=None):
+        # Возвращает Future с ts; для уже отправленного ключа — сразу готовый Future.
+        # parent — (source_table, transaction_id) сообщения, в тред которого идёт ответ;
+        # по умолчанию это сообщение той же транзакции.
+        key = (source_table, transaction_id, int(reply), status if reply else '')
+        with self._lock:
+            if key in self._in_flight:
+                return self._in_flight[key]
+
+            row = self._conn.execute(
+                f"SELECT ts, channel, text, attempts, parent_table, parent_id FROM outbox WHERE {_KEY_CLAUSE}",
+                (self.monitor,) + key,
+            ).fetchone()
+            if row is None:
+                parent_table, parent_id = parent if parent is not None else (None, None)
+                self._conn.execute(
+                    "INSERT INTO outbox (monitor, source_table, transaction_id, is_reply, status, channel, text, created_at, "
+                    "parent_table, parent_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (self.monitor,) + key + (channel, text, time.time(), parent_table, parent_id),
+                )
+            elif row[0] is not None or row[3] >= OUTBOX_MAX_ATTEMPTS:
+                # Уже отправлено (ts) или брошено после OUTBOX_MAX_ATTEMPTS попыток (None).
+                future = Future()
+                future.set_result(row[0])
+                return future
+            else:
+                channel, text = row[1], row[2]
+                parent = (row[4], row[5]) if row[4] is not None else None
+
+            if reply and thread_ts is None:
+                thread_ts = self._parent_ts(*(parent or (source_table, transaction_id)))
+            return self._send(key, channel, text, thread_ts)
+
+    def drain(self, force=False):
+        now = time.time()
+        if not force and now - self._last_drain < OUTBOX_DRAIN_INTERVAL:
+            return
+        self._last_drain = now
+
+        with self._lock:
+            # Брошенные записи живут столько же, сколько подтверждённые: пока они есть,
+            # тот же ключ не отправляется заново.
+            self._conn.execute(
+                "DELETE FROM outbox WHERE monitor = ? AND (ts IS NOT NULL OR attempts >= ?) AND created_at < ?",
+                (self.monitor, OUTBOX_MAX_ATTEMPTS, now - OUTBOX_RETENTION),
+            )
+            rows = self._conn.execute(
+                "SELECT source_table, transaction_id, is_reply, status, channel, text, parent_table, parent_id FROM outbox "
+                "WHERE monitor = ? AND ts IS NULL AND attempts < ? ORDER BY created_at",
+                (self.monitor, OUTBOX_MAX_ATTEMPTS),
+            ).fetchall()
+
+            for source_table, transaction_id, is_reply, status, channel, text, parent_table, parent_id in rows:
+                key = (source_table, transaction_id, is_reply, status)
+                if key in self._in_flight:
+                    continue
+                parent = (parent_table, parent_id) if parent_table is not None else (source_table, transaction_id)
+                thread_ts = self._parent_ts(*parent) if is_reply else None
+                self._send(key, channel, text, thread_ts)
+
+    def get_metrics(self):
+        with self._lock:
+            unacked = self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE monitor = ? AND ts IS NULL AND attempts < ?",
+                (self.monitor, OUTBOX_MAX_ATTEMPTS),
+            ).fetchone()[0]
+            return dict(self.metrics, unacked=unacked)
+
+
+def get_outbox_metrics():
+    with _registry_lock:
+        registered = list(outboxes.values())
+    return {outbox.monitor: outbox.get_metrics() for outbox in registered}
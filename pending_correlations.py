@@ -0,0 +1,69 @@
+import os
+import time
+
+PENDING_CORRELATION_BASE_DELAY = float(os.environ.get("PENDING_CORRELATION_BASE_DELAY", 5))
+PENDING_CORRELATION_MAX_DELAY = float(os.environ.get("PENDING_CORRELATION_MAX_DELAY", 300))
+PENDING_CORRELATION_MAX_ATTEMPTS = int(os.environ.get("PENDING_CORRELATION_MAX_ATTEMPTS", 8))
+
+class PendingCorrelations:
+    # Строки, для которых ещё не нашлась запись в core.project_transactions.
+    # Повторяем поиск с экспоненциальной задержкой, а не на каждом цикле опроса.
+    # Водяной знак уже прошёл мимо этих строк, поэтому их id, попытки и время
+    # следующей попытки сохраняются в state_store и переживают перезапуск.
+
+    def __init__(self, state_store=None):
+        self._pending = {}
+        self._state_store = state_store
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._pending
+
+    def _delay(self, attempts):
+        return min(PENDING_CORRELATION_BASE_DELAY * 2 ** attempts, PENDING_CORRELATION_MAX_DELAY)
+
+    def _save(self, transaction_id):
+        if self._state_store is not None:
+            entry = self._pending[transaction_id]
+            self._state_store.save_pending(transaction_id, entry['attempts'], entry['next_attempt_at'])
+
+    def add(self, row):
+        if row['id'] in self._pending:
+            return
+        self._pending[row['id']] = {
+            'row': row,
+            'attempts': 1,
+            'next_attempt_at': time.time() + self._delay(0),
+        }
+        self._save(row['id'])
+
+    def restore(self, rows, saved):
+        # rows — заново прочитанные строки, saved — {id: (attempts, next_attempt_at)} из state_store.
+        # Строки, которых в таблице больше нет, ждать незачем.
+        saved = dict(saved)
+        for row in rows:
+            attempts, next_attempt_at = saved.pop(row['id'])
+            self._pending[row['id']] = {'row': row, 'attempts': attempts, 'next_attempt_at': next_attempt_at}
+        if self._state_store is not None:
+            for transaction_id in saved:
+                self._state_store.forget_pending(transaction_id)
+
+    def due(self):
+        now = time.time()
+        return [entry['row'] for entry in self._pending.values() if entry['next_attempt_at'] <= now]
+
+    def record_failure(self, transaction_id):
+        # True — попробуем ещё раз позже, False — попытки исчерпаны.
+        entry = self._pending[transaction_id]
+        if entry['attempts'] >= PENDING_CORRELATION_MAX_ATTEMPTS:
+            return False
+        entry['next_attempt_at'] = time.time() + self._delay(entry['attempts'])
+        entry['attempts'] += 1
+        self._save(transaction_id)
+        return True
+
+    def remove(self, transaction_id):
+        if self._pending.pop(transaction_id, None) is not None and self._state_store is not None:
+            self._state_store.forget_pending(transaction_id)
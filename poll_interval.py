@@ -0,0 +1,47 @@
+import os
+import threading
+
+# Пауза между циклами опроса: минимальная, пока приходят новые строки или меняются статусы,
+# и удваивается на каждом пустом цикле до потолка. Для отдельного монитора границы
+# переопределяются через POLL_INTERVAL_MIN_<ИМЯ> / POLL_INTERVAL_MAX_<ИМЯ>.
+POLL_INTERVAL_MIN = float(os.environ.get("POLL_INTERVAL_MIN", 1))
+POLL_INTERVAL_MAX = float(os.environ.get("POLL_INTERVAL_MAX", 30))
+POLL_INTERVAL_BACKOFF = float(os.environ.get("POLL_INTERVAL_BACKOFF", 2))
+
+# monitor -> AdaptivePollInterval
+poll_intervals = {}
+_lock = threading.Lock()
+
+
+def _setting(name, monitor, default):
+    return float(os.environ.get(f"{name}_{monitor.upper()}", default))
+
+
+class AdaptivePollInterval:
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+        self.min_interval = _setting("POLL_INTERVAL_MIN", monitor, POLL_INTERVAL_MIN)
+        self.max_interval = max(self.min_interval, _setting("POLL_INTERVAL_MAX", monitor, POLL_INTERVAL_MAX))
+        self.interval = self.min_interval
+        self.metrics = {'active_cycles': 0, 'idle_cycles': 0}
+        with _lock:
+            poll_intervals[monitor] = self
+
+    def next(self, activity):
+        # activity — сколько строк обработано за цикл (новые и сменившие статус).
+        if activity:
+            self.interval = self.min_interval
+            self.metrics['active_cycles'] += 1
+        else:
+            self.interval = min(self.interval * POLL_INTERVAL_BACKOFF, self.max_interval)
+            self.metrics['idle_cycles'] += 1
+        return self.interval
+
+
+def get_poll_interval_metrics():
+    with _lock:
+        return {
+            monitor: dict(poll_interval.metrics, interval=poll_interval.interval)
+            for monitor, poll_interval in poll_intervals.items()
+        }
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PROJECT_CACHE_TTL = float(os.environ.get("PROJECT_CACHE_TTL", 3600))
+PROJECT_CACHE_MAX_SIZE = int(os.environ.get("PROJECT_CACHE_MAX_SIZE", 10000))
+# Сколько секунд помнить, что проекта с таким id нет, прежде чем спросить базу снова.
+PROJECT_CACHE_NEGATIVE_TTL = float(os.environ.get("PROJECT_CACHE_NEGATIVE_TTL", 300))
+
+# project_id -> (name, момент загрузки); name = None — проекта нет в projects.
+# Порядок ключей = порядок использования (LRU).
+_project_names = OrderedDict()
+_lock = threading.Lock()
+_MISSING = object()
+project_cache_metrics = {'hits': 0, 'negative_hits': 0, 'misses': 0, 'evictions': 0, 'queries': 0}
+
+
+def _get_cached(project_id, now):
+    # Возвращает имя, None для известного отсутствующего проекта или _MISSING.
+    entry = _project_names.get(project_id)
+    if entry is None:
+        return _MISSING
+    name, loaded_at = entry
+    ttl = PROJECT_CACHE_TTL if name is not None else PROJECT_CACHE_NEGATIVE_TTL
+    if now - loaded_at > ttl:
+        del _project_names[project_id]
+        return _MISSING
+    _project_names.move_to_end(project_id)
+    return name
+
+
+def _store(project_id, name, now):
+    _project_names[project_id] = (name, now)
+    _project_names.move_to_end(project_id)
+    while len(_project_names) > PROJECT_CACHE_MAX_SIZE:
+        _project_names.popitem(last=False)
+        project_cache_metrics['evictions'] += 1
+
+
+def get_project_names(cursor, project_ids):
+    # Возвращает {project_id: name} для всей пачки; все промахи добираются одним запросом.
+    # Проектов, которых нет в базе, в результате нет.
+    now = time.monotonic()
+    names = {}
+    missing = []
+
+    with _lock:
+        for project_id in set(project_ids):
+            name = _get_cached(project_id, now)
+            if name is _MISSING:
+                missing.append(project_id)
+                project_cache_metrics['misses'] += 1
+            elif name is None:
+                project_cache_metrics['negative_hits'] += 1
+            else:
+                names[project_id] = name
+                project_cache_metrics['hits'] += 1
+
+    if missing:
+        placeholders = ", ".join(["%s"] * len(missing))
+        cursor.execute(f"SELECT id, name FROM projects WHERE id IN ({placeholders})", missing)
+        rows = cursor.fetchall()
+
+        with _lock:
+            project_cache_metrics['queries'] += 1
+            for row in rows:
+                _store(row['id'], row['name'], now)
+                names[row['id']] = row['name']
+            for project_id in missing:
+                if project_id not in names:
+                    _store(project_id, None, now)
+
+    return names
+
+
+def get_project_cache_metrics():
+    with _lock:
+        return dict(project_cache_metrics, size=len(_project_names))
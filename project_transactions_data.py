@@ -1,38 +1,87 @@
-import mysql.connector
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-MYSQL_HOST = os.environ["MYSQL_HOST"]
-MYSQL_PORT = int(os.environ["MYSQL_PORT"])
-MYSQL_USER = os.environ["MYSQL_USER"]
-MYSQL_PASSWORD = os.environ["MYSQL_PASSWORD"]
-MYSQL_DB_NAME = os.environ["MYSQL_DB_NAME"]
-
-def create_auth_db_connection():
-    return mysql.connector.connect(
-        host=MYSQL_HOST,
-        port=MYSQL_PORT,
-        user=MYSQL_USER,
-        password=MYSQL_PASSWORD,
-        database=MYSQL_DB_NAME,
-    )
-
-def get_project_transactions_data():
-    conn = create_auth_db_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    query = """
-        SELECT id, owner_merchant_id, amount, created_at 
-        FROM core.project_transactions
-        ORDER BY id DESC LIMIT 20
-    """
-    cursor.execute(query)
-    transactions = cursor.fetchall()
-
-    cursor.close()
-    conn.close()
-
-    return transactions
-    
+from datetime import timedelta
+
+PROJECT_TRANSACTIONS_PAGE_SIZE = int(os.environ.get("PROJECT_TRANSACTIONS_PAGE_SIZE", 500))
+# Сколько секунд истории (от самой старой строки текущей пачки) держать в индексе.
+PROJECT_TRANSACTIONS_WINDOW = float(os.environ.get("PROJECT_TRANSACTIONS_WINDOW", 3600))
+
+def _correlation_key(transaction):
+    return (transaction["amount"], transaction["owner_merchant_id"], transaction["created_at"])
+
+class ProjectTransactionsIndex:
+    # Скользящий индекс core.project_transactions по (amount, owner_merchant_id, created_at).
+    # Всё, что имеет created_at >= covered_from и id <= last_id, уже лежит в индексе,
+    # поэтому каждый цикл дочитывает только новые строки (id > last_id) страницами по id.
+
+    def __init__(self):
+        self.index = {}
+        self.covered_from = None
+        self.last_id = None
+
+    def _load_pages(self, cursor, condition, params, after_id):
+        max_id = after_id
+        while True:
+            query = f"""
+                SELECT id, owner_merchant_id, amount, created_at
+                FROM core.project_transactions
+                WHERE {condition} AND id > %s
+                ORDER BY id LIMIT %s
+            """
+            cursor.execute(query, params + (after_id, PROJECT_TRANSACTIONS_PAGE_SIZE))
+            page = cursor.fetchall()
+
+            # Идём по возрастанию id, так что при совпадении ключей остаётся самая новая транзакция.
+            for transaction in page:
+                self.index[_correlation_key(transaction)] = transaction["id"]
+
+            if page:
+                after_id = page[-1]["id"]
+                max_id = max(max_id, after_id)
+            if len(page) < PROJECT_TRANSACTIONS_PAGE_SIZE:
+                return max_id
+
+    def refresh(self, cursor, rows):
+        if not rows:
+            return
+
+        batch_start = min(row["created_at"] for row in rows)
+
+        if self.last_id is None:
+            self.covered_from = batch_start
+        elif batch_start < self.covered_from:
+            # В пачке есть строки старше окна — догружаем только недостающий кусок.
+            self._load_pages(
+                cursor,
+                "created_at >= %s AND created_at < %s AND id <= %s",
+                (batch_start, self.covered_from, self.last_id),
+                0,
+            )
+            self.covered_from = batch_start
+
+        self.last_id = self._load_pages(cursor, "created_at >= %s", (self.covered_from,), self.last_id or 0)
+
+        cutoff = batch_start - timedelta(seconds=PROJECT_TRANSACTIONS_WINDOW)
+        if self.covered_from < cutoff:
+            self.index = {key: transaction_id for key, transaction_id in self.index.items() if key[2] >= cutoff}
+            self.covered_from = cutoff
+
+    def find_real_transaction_id(self, cursor, row):
+        key = _correlation_key(row)
+        real_transaction_id = self.index.get(key)
+        if real_transaction_id is not None:
+            return real_transaction_id
+
+        # Транзакция могла закоммититься позже строк с бóльшим id — ищем её точечным запросом.
+        query = """
+            SELECT id
+            FROM core.project_transactions
+            WHERE amount = %s AND owner_merchant_id = %s AND created_at = %s
+            ORDER BY id DESC LIMIT 1
+        """
+        cursor.execute(query, key)
+        transaction = cursor.fetchone()
+        if transaction is None:
+            return None
+
+        self.index[key] = transaction["id"]
+        return transaction["id"]
@@ -0,0 +1,8 @@
+import os
+
+RISK_SCORE_THRESHOLD = float(os.environ.get("RISK_SCORE_THRESHOLD", 0.5))
+
+def risk_filter_clause(threshold=RISK_SCORE_THRESHOLD):
+    # Фильтр уходит в WHERE, чтобы депозиты с низким риском не передавались по сети.
+    # NULL сравнение с порогом отсекает само.
+    return "risk_score > %s", (threshold,)
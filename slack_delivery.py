@@ -0,0 +1,155 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from dotenv import load_dotenv
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+from histogram import Histogram
+
+load_dotenv()
+
+SLACK_BOT_TOKEN = os.environ["SLACK_BOT_TOKEN"]
+# Для нагрузочных прогонов клиент можно направить на локальный fake_slack.py.
+SLACK_BASE_URL = os.environ.get("SLACK_BASE_URL", WebClient.BASE_URL)
+SLACK_DELIVERY_WORKERS = int(os.environ.get("SLACK_DELIVERY_WORKERS", 4))
+# chat.postMessage: около одного сообщения в секунду на канал, короткие всплески допустимы.
+SLACK_CHANNEL_RATE = float(os.environ.get("SLACK_CHANNEL_RATE", 1))
+SLACK_CHANNEL_BURST = int(os.environ.get("SLACK_CHANNEL_BURST", 3))
+SLACK_MAX_RATE_LIMIT_RETRIES = int(os.environ.get("SLACK_MAX_RATE_LIMIT_RETRIES", 10))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        # Slack ответил 429: до истечения Retry-After в канал не отправляем ничего.
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+
+def _retry_after(error):
+    headers = error.response.headers or {}
+    value = headers.get('Retry-After') or headers.get('retry-after') or 1
+    return float(value[0] if isinstance(value, list) else value)
+
+
+class SlackDelivery:
+    # Очередь отправки в Slack, отвязанная от цикла опроса базы.
+    # Сообщения с одинаковым ordering_key всегда попадают к одному воркеру,
+    # поэтому сообщение транзакции и ответы в её треде уходят строго по порядку.
+
+    def __init__(self, client, workers=SLACK_DELIVERY_WORKERS):
+        self.client = client
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        self.metrics = {'sent': 0, 'failed': 0, 'rate_limited': 0}
+        # Длительность одного вызова chat.postMessage, включая ответы 429.
+        self.latency = Histogram()
+        self._metrics_lock = threading.Lock()
+        self._queues = [queue.Queue() for _ in range(workers)]
+        for jobs in self._queues:
+            threading.Thread(target=self._worker, args=(jobs,), daemon=True).start()
+
+    def post_message(self, channel, text, thread_ts=None, ordering_key=None):
+        # Возвращает Future с ts сообщения (None, если отправить не удалось).
+        # thread_ts может быть строкой или Future родительского сообщения.
+        future = Future()
+        key = ordering_key if ordering_key is not None else channel
+        jobs = self._queues[hash(key) % len(self._queues)]
+        jobs.put((future, {'channel': channel, 'text': text, 'thread_ts': thread_ts}))
+        return future
+
+    def _count(self, name):
+        with self._metrics_lock:
+            self.metrics[name] += 1
+
+    def _observe_latency(self, seconds):
+        with self._metrics_lock:
+            self.latency.observe(seconds)
+
+    def _bucket(self, channel):
+        with self._buckets_lock:
+            bucket = self._buckets.get(channel)
+            if bucket is None:
+                bucket = TokenBucket(SLACK_CHANNEL_RATE, SLACK_CHANNEL_BURST)
+                self._buckets[channel] = bucket
+            return bucket
+
+    def _send(self, message):
+        # 429 повторяем на месте, а не в конце очереди, чтобы не нарушить порядок в треде.
+        bucket = self._bucket(message['channel'])
+        attempts = 0
+        while True:
+            bucket.acquire()
+            started = time.perf_counter()
+            try:
+                return self.client.chat_postMessage(**message)['ts']
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempts >= SLACK_MAX_RATE_LIMIT_RETRIES:
+                    raise
+                attempts += 1
+                self._count('rate_limited')
+                bucket.pause(_retry_after(e))
+            finally:
+                self._observe_latency(time.perf_counter() - started)
+
+    def queue_depth(self):
+        return sum(jobs.qsize() for jobs in self._queues)
+
+    def get_metrics(self):
+        # Счётчики и копия гистограммы задержки, снятые согласованно.
+        with self._metrics_lock:
+            return dict(self.metrics, queue_depth=self.queue_depth()), self.latency.copy()
+
+    def _worker(self, jobs):
+        while True:
+            future, message = jobs.get()
+            try:
+                if isinstance(message['thread_ts'], Future):
+                    message['thread_ts'] = message['thread_ts'].result()
+                    if message['thread_ts'] is None:
+                        # Родитель не отправился: ответ без треда ушёл бы отдельным сообщением.
+                        # Оставляем его неподтверждённым — outbox дошлёт его после родителя.
+                        print(f"Skipping reply to {message['channel']}: parent message was not delivered")
+                        self._count('failed')
+                        future.set_result(None)
+                        continue
+                future.set_result(self._send(message))
+                self._count('sent')
+            except SlackApiError as e:
+                print(f"Error sending message to {message['channel']}: {e}")
+                self._count('failed')
+                future.set_result(None)
+            except Exception as e:
+                print(f"Unexpected error sending message to {message['channel']}: {e}")
+                self._count('failed')
+                future.set_result(None)
+            finally:
+                jobs.task_done()
+
+
+slack_client = WebClient(token=SLACK_BOT_TOKEN, base_url=SLACK_BASE_URL)
+slack_delivery = SlackDelivery(slack_client)
@@ -0,0 +1,186 @@
+import os
+import sqlite3
+import threading
+import time
+
+STATE_DB_PATH = os.environ.get("STATE_DB_PATH", "notify_state.sqlite3")
+
+
+class StateStore:
+    # Локальное долговечное состояние монитора: водяной знак, ts сообщений в Slack
+    # и строки, которые ещё ждут сопоставления с core.project_transactions.
+    # Изменения копятся в памяти и пишутся одной транзакцией в конце цикла (flush).
+
+    def __init__(self, monitor, path=STATE_DB_PATH):
+        self.monitor = monitor
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS watermarks (
+                monitor TEXT PRIMARY KEY,
+                last_processed_id INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS tracked_messages (
+                monitor TEXT NOT NULL,
+                transaction_id INTEGER NOT NULL,
+                ts TEXT,
+                status TEXT,
+                tracked_at REAL,
+                digest_id INTEGER,
+                PRIMARY KEY (monitor, transaction_id)
+            )
+        """)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(tracked_messages)")]
+        for column, column_type in (('tracked_at', 'REAL'), ('digest_id', 'INTEGER')):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE tracked_messages ADD COLUMN {column} {column_type}")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS pending_correlations (
+                monitor TEXT NOT NULL,
+                transaction_id INTEGER NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                PRIMARY KEY (monitor, transaction_id)
+            )
+        """)
+        self._watermark = None
+        self._tracked = {}
+        self._forgotten = set()
+        self._pending = {}
+        self._resolved = set()
+
+    def load_watermark(self):
+        row = self._conn.execute(
+            "SELECT last_processed_id FROM watermarks WHERE monitor = ?", (self.monitor,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def load_tracked(self):
+        # В порядке постановки на отслеживание: TrackedTransactions вытесняет устаревшие с начала.
+        # tracked_at может быть NULL у записей, сохранённых до появления колонки.
+        rows = self._conn.execute(
+            "SELECT transaction_id, ts, status, tracked_at, digest_id FROM tracked_messages WHERE monitor = ? "
+            "ORDER BY tracked_at IS NULL, tracked_at",
+            (self.monitor,),
+        ).fetchall()
+        tracked = {}
+        now = time.time()
+        for transaction_id, ts, status, tracked_at, digest_id in rows:
+            if tracked_at is None:
+                tracked_at = now
+                self.save_tracked_at(transaction_id, tracked_at)
+            tracked[transaction_id] = (ts, status, tracked_at, digest_id)
+        return tracked
+
+    def load_pending(self):
+        rows = self._conn.execute(
+            "SELECT transaction_id, attempts, next_attempt_at FROM pending_correlations WHERE monitor = ?",
+            (self.monitor,),
+        ).fetchall()
+        return {transaction_id: (attempts, next_attempt_at) for transaction_id, attempts, next_attempt_at in rows}
+
+    def save_watermark(self, last_processed_id):
+        if last_processed_id is None:
+            return
+        with self._lock:
+            self._watermark = last_processed_id
+
+    def save_message_ts(self, transaction_id, ts):
+        with self._lock:
+            self._forgotten.discard(transaction_id)
+            self._tracked.setdefault(transaction_id, {})['ts'] = ts
+
+    def save_status(self, transaction_id, status):
+        with self._lock:
+            self._forgotten.discard(transaction_id)
+            self._tracked.setdefault(transaction_id, {})['status'] = status
+
+    def save_tracked_at(self, transaction_id, tracked_at):
+        with self._lock:
+            self._forgotten.discard(transaction_id)
+            self._tracked.setdefault(transaction_id, {})['tracked_at'] = tracked_at
+
+    def save_digest_id(self, transaction_id, digest_id):
+        with self._lock:
+            self._forgotten.discard(transaction_id)
+            self._tracked.setdefault(transaction_id, {})['digest_id'] = digest_id
+
+    def forget(self, transaction_id):
+        with self._lock:
+            self._tracked.pop(transaction_id, None)
+            self._forgotten.add(transaction_id)
+
+    def save_pending(self, transaction_id, attempts, next_attempt_at):
+        # Пишется в той же транзакции, что и водяной знак, который уже прошёл мимо строки.
+        with self._lock:
+            self._resolved.discard(transaction_id)
+            self._pending[transaction_id] = (attempts, next_attempt_at)
+
+    def forget_pending(self, transaction_id):
+        with self._lock:
+            self._pending.pop(transaction_id, None)
+            self._resolved.add(transaction_id)
+
+    def flush(self):
+        with self._lock:
+            watermark, self._watermark = self._watermark, None
+            tracked, self._tracked = self._tracked, {}
+            forgotten, self._forgotten = self._forgotten, set()
+            pending, self._pending = self._pending, {}
+            resolved, self._resolved = self._resolved, set()
+
+        if watermark is None and not tracked and not forgotten and not pending and not resolved:
+            return
+
+        self._conn.execute("BEGIN")
+        try:
+            if watermark is not None:
+                self._conn.execute(
+                    "INSERT INTO watermarks (monitor, last_processed_id) VALUES (?, ?) "
+                    "ON CONFLICT (monitor) DO UPDATE SET last_processed_id = excluded.last_processed_id",
+                    (self.monitor, watermark),
+                )
+            self._conn.executemany(
+                "INSERT INTO tracked_messages (monitor, transaction_id, ts, status, tracked_at, digest_id) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (monitor, transaction_id) DO UPDATE SET "
+                "ts = COALESCE(excluded.ts, ts), status = COALESCE(excluded.status, status), "
+                "tracked_at = COALESCE(excluded.tracked_at, tracked_at), "
+                "digest_id = COALESCE(excluded.digest_id, digest_id)",
+                [
+                    (
+                        self.monitor,
+                        transaction_id,
+                        changes.get('ts'),
+                        changes.get('status'),
+                        changes.get('tracked_at'),
+                        changes.get('digest_id'),
+                    )
+                    for transaction_id, changes in tracked.items()
+                ],
+            )
+            self._conn.executemany(
+                "DELETE FROM tracked_messages WHERE monitor = ? AND transaction_id = ?",
+                [(self.monitor, transaction_id) for transaction_id in forgotten],
+            )
+            self._conn.executemany(
+                "INSERT INTO pending_correlations (monitor, transaction_id, attempts, next_attempt_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (monitor, transaction_id) DO UPDATE SET "
+                "attempts = excluded.attempts, next_attempt_at = excluded.next_attempt_at",
+                [
+                    (self.monitor, transaction_id, attempts, next_attempt_at)
+                    for transaction_id, (attempts, next_attempt_at) in pending.items()
+                ],
+            )
+            self._conn.executemany(
+                "DELETE FROM pending_correlations WHERE monitor = ? AND transaction_id = ?",
+                [(self.monitor, transaction_id) for transaction_id in resolved],
+            )
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
@@ -0,0 +1,35 @@
+import os
+
+STATUS_REFRESH_CHUNK_SIZE = int(os.environ.get("STATUS_REFRESH_CHUNK_SIZE", 1000))
+STATUS_COLUMNS = ("id", "status")
+
+
+def _chunks(transaction_ids):
+    for start in range(0, len(transaction_ids), STATUS_REFRESH_CHUNK_SIZE):
+        yield transaction_ids[start:start + STATUS_REFRESH_CHUNK_SIZE]
+
+
+def select_by_ids(cursor, table, columns, transaction_ids, params=()):
+    # params — параметры выражений в columns, они стоят перед списком id.
+    rows = []
+    for chunk in _chunks(transaction_ids):
+        placeholders = ", ".join(["%s"] * len(chunk))
+        query = f"SELECT {', '.join(columns)} FROM {table} WHERE id IN ({placeholders})"
+        cursor.execute(query, tuple(params) + tuple(chunk))
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def fetch_changed_statuses(cursor, table, known_statuses, columns=STATUS_COLUMNS):
+    # known_statuses: {transaction_id: последний известный статус или None}.
+    # Сначала читаем только id и status по всем отслеживаемым транзакциям,
+    # остальные колонки (если нужны) — лишь для тех, у кого статус сменился.
+    changed_rows = [
+        row for row in select_by_ids(cursor, table, STATUS_COLUMNS, list(known_statuses))
+        if row['status'] != known_statuses[row['id']]
+    ]
+
+    if not changed_rows or set(columns) <= set(STATUS_COLUMNS):
+        return changed_rows
+
+    return select_by_ids(cursor, table, columns, [row['id'] for row in changed_rows])
@@ -0,0 +1,118 @@
+import argparse
+import importlib
+import os
+import threading
+import time
+import traceback
+
+from dotenv import load_dotenv
+
+from metrics_server import collectors, format_metric, start_metrics_server
+
+load_dotenv()
+
+AVAILABLE_MONITORS = ('exchange_transactions', 'risk_score', 'cashouts', 'users')
+# Подписчики общего потока депозитов: все выбранные работают в одном потоке и одном запросе.
+DEPOSIT_SUBSCRIBERS = ('risk_score', 'users')
+DEFAULT_MONITORS = os.environ.get("MONITORS", "exchange_transactions,risk_score,cashouts")
+
+SUPERVISOR_BACKOFF_BASE = float(os.environ.get("SUPERVISOR_BACKOFF_BASE", 1))
+SUPERVISOR_BACKOFF_MAX = float(os.environ.get("SUPERVISOR_BACKOFF_MAX", 60))
+# Если монитор проработал дольше этого, следующий перезапуск снова начинается с минимальной паузы.
+SUPERVISOR_HEALTHY_RUN = float(os.environ.get("SUPERVISOR_HEALTHY_RUN", 300))
+
+monitor_status = {}
+_status_lock = threading.Lock()
+
+
+def run_monitor(name):
+    importlib.import_module(name).monitor_transactions()
+
+
+def run_deposit_stream(names):
+    import deposit_stream
+
+    # Разные имена могут означать одного подписчика: users — тот же подписчик, что risk_score.
+    subscribers = []
+    for name in names:
+        subscriber = importlib.import_module(name).subscriber
+        if subscriber not in subscribers:
+            subscribers.append(subscriber)
+    deposit_stream.monitor_transactions(subscribers)
+
+
+def supervise(name, run, *args):
+    # Модули мониторов импортируются в одном процессе, поэтому пулы соединений,
+    # кэши и клиент Slack у них общие.
+    failures = 0
+
+    while True:
+        started = time.monotonic()
+        try:
+            run(*args)
+            print(f"Monitor {name} exited, restarting")
+        except Exception:
+            print(f"Monitor {name} crashed:\n{traceback.format_exc()}")
+
+        if time.monotonic() - started >= SUPERVISOR_HEALTHY_RUN:
+            failures = 0
+        delay = min(SUPERVISOR_BACKOFF_BASE * 2 ** failures, SUPERVISOR_BACKOFF_MAX)
+        failures += 1
+
+        with _status_lock:
+            monitor_status[name]['restarts'] += 1
+        time.sleep(delay)
+
+
+def format_supervisor_metrics():
+    with _status_lock:
+        samples = [({'monitor': name}, status['restarts']) for name, status in sorted(monitor_status.items())]
+    return format_metric("notify_monitor_restarts_total", "counter", "Monitor restarts by the supervisor.", samples)
+
+
+collectors.append(format_supervisor_metrics)
+
+
+def parse_monitors(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in AVAILABLE_MONITORS]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown monitors: {', '.join(unknown)} (available: {', '.join(AVAILABLE_MONITORS)})"
+        )
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run transaction monitors in one process")
+    parser.add_argument(
+        "--monitors",
+        type=parse_monitors,
+        default=parse_monitors(DEFAULT_MONITORS),
+        help=f"comma-separated list of monitors ({', '.join(AVAILABLE_MONITORS)})",
+    )
+    args = parser.parse_args()
+
+    tasks = [(name, run_monitor, name) for name in args.monitors if name not in DEPOSIT_SUBSCRIBERS]
+    deposit_names = [name for name in args.monitors if name in DEPOSIT_SUBSCRIBERS]
+    if deposit_names:
+        tasks.append(("deposit_stream", run_deposit_stream, deposit_names))
+
+    start_metrics_server()
+
+    threads = []
+    for name, run, argument in tasks:
+        monitor_status[name] = {'restarts': 0}
+        thread = threading.Thread(target=supervise, args=(name, run, argument), name=name, daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Настройки читаются при импорте модулей, поэтому задаются до него.
+os.environ.setdefault("SLACK_BOT_TOKEN", "xoxb-test")
+os.environ.setdefault("SLACK_CHANNEL_RATE", "1000")
+os.environ.setdefault("SLACK_CHANNEL_BURST", "1000")
+os.environ.setdefault("SLACK_CHANNEL_ID", "C-MONITOR")
+os.environ.setdefault("SLACK_RISK_ID", "C-RISK")
+# Модули мониторов открывают StateStore при импорте — не в рабочем каталоге.
+os.environ.setdefault("STATE_DB_PATH", os.path.join(tempfile.mkdtemp(), "state.sqlite3"))
+# Пул создаётся лениво; тесты подменяют db_cursor и к MySQL не ходят.
+for name, value in (("MYSQL_HOST", "127.0.0.1"), ("MYSQL_PORT", "3306"), ("MYSQL_USER", "test"),
+                    ("MYSQL_PASSWORD", "test"), ("MYSQL_DB_NAME", "test"), ("MYSQL_DB_MERCHANT", "test")):
+    os.environ.setdefault(name, value)
+
+from slack_sdk import WebClient  # noqa: E402
+
+from fake_slack import FakeSlack  # noqa: E402
+from slack_delivery import SlackDelivery  # noqa: E402
+
+
+@pytest.fixture
+def fake_slack():
+    fake = FakeSlack().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def delivery(fake_slack):
+    return SlackDelivery(WebClient(token="xoxb-test", base_url=fake_slack.url))
+
+
+@pytest.fixture
+def state_path(tmp_path):
+    return str(tmp_path / "state.sqlite3")
+
+
+def wait_for(condition, timeout=5):
+    # Колбэки Future выполняются в потоке воркера уже после того, как result() вернулся.
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
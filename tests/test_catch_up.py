@@ -0,0 +1,86 @@
+import catch_up
+from catch_up import format_backlog_digest, summarize_backlog
+
+
+class FakeCursor:
+    # Таблица в памяти; понимает MAX(id), COUNT(*) и GROUP BY из summarize_backlog.
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.ranges = []
+
+    def execute(self, query, params=()):
+        if "MAX(id)" in query:
+            self._result = [{'max_id': max(row['id'] for row in self.rows)}]
+            return
+
+        start, end = params[:2]
+        rows = [row for row in self.rows if start < row['id'] <= end]
+        if "COUNT(*) AS count FROM" in query:
+            self._result = [{'count': len(rows)}]
+            return
+
+        self.ranges.append((start, end))
+        groups = {}
+        for row in rows:
+            key = (row['owner_merchant_id'], row['currency'], row['status'])
+            group = groups.setdefault(key, {'count': 0, 'amount': 0})
+            group['count'] += 1
+            group['amount'] += row['amount']
+        self._result = [
+            {'owner_merchant_id': merchant_id, 'currency': currency, 'status': status, **group}
+            for (merchant_id, currency, status), group in groups.items()
+        ]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+def rows(count, merchant_id=1, start=1):
+    return [
+        {'id': row_id, 'owner_merchant_id': merchant_id, 'currency': 'trx', 'status': 'success' if row_id % 2 else 'rejected', 'amount': 2}
+        for row_id in range(start, start + count)
+    ]
+
+
+def test_small_backlog_is_sent_as_usual():
+    cursor = FakeCursor(rows(10))
+
+    assert summarize_backlog(cursor, "t", 0, "amount", "currency", min_count=10) is None
+    assert cursor.ranges == []
+
+
+def test_backlog_is_summed_in_id_ranges(monkeypatch):
+    monkeypatch.setattr(catch_up, "CATCHUP_ID_RANGE", 4)
+    monkeypatch.setattr(catch_up, "CATCHUP_RANGE_DELAY", 0)
+    cursor = FakeCursor(rows(10) + rows(3, merchant_id=2, start=11))
+
+    summary = summarize_backlog(cursor, "t", 0, "amount", "currency", min_count=5)
+
+    assert cursor.ranges == [(0, 4), (4, 8), (8, 12), (12, 13)]
+    assert (summary['from_id'], summary['to_id'], summary['count']) == (0, 13, 13)
+    entry = summary['totals'][(1, 'trx')]
+    assert (entry['count'], entry['amount'], dict(entry['statuses'])) == (10, 20, {'success': 5, 'rejected': 5})
+
+
+def test_upper_id_bounds_the_summary(monkeypatch):
+    monkeypatch.setattr(catch_up, "CATCHUP_RANGE_DELAY", 0)
+
+    summary = summarize_backlog(FakeCursor(rows(10)), "t", 2, "amount", "currency", min_count=0, upper_id=6)
+
+    assert (summary['to_id'], summary['count']) == (6, 4)
+
+
+def test_digest_lists_largest_groups_first(monkeypatch):
+    monkeypatch.setattr(catch_up, "CATCHUP_RANGE_DELAY", 0)
+    monkeypatch.setattr(catch_up, "CATCHUP_DIGEST_MAX_LINES", 1)
+    summary = summarize_backlog(FakeCursor(rows(3) + rows(5, merchant_id=2, start=4)), "t", 0, "amount", "currency", min_count=0)
+
+    text = format_backlog_digest("ManualCashout", summary, {2: "Shop"})
+
+    assert "8 transactions (#1 – #8)" in text
+    assert "• Shop: 5 × 10 trx (rejected: 3, success: 2)" in text
+    assert "…and 1 more merchant/currency groups" in text
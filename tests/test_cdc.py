@@ -0,0 +1,149 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import cdc
+from cdc import ChangeFeed, check_server
+
+TABLE = "project_withdrawal_crypto_transactions"
+
+
+def insert(row_id):
+    return SimpleNamespace(table=TABLE, rows=[{'values': {'id': row_id, 'status': 'in_progress'}}])
+
+
+def update(row_id, before, after):
+    return SimpleNamespace(table=TABLE, rows=[{
+        'before_values': {'id': row_id, 'status': before},
+        'after_values': {'id': row_id, 'status': after},
+    }])
+
+
+def connected_feed():
+    feed = ChangeFeed()
+    feed.connected = True
+    # Первый wait() после подключения — всегда полный опрос.
+    assert feed.wait(TABLE, 0) is None
+    return feed
+
+
+def test_disconnected_feed_asks_for_full_poll_after_timeout():
+    feed = ChangeFeed()
+    started = time.monotonic()
+
+    assert feed.wait(TABLE, 0.05) is None
+    assert time.monotonic() - started >= 0.05
+
+
+def test_only_status_changes_are_reported_as_updates():
+    feed = connected_feed()
+    feed._record(insert(10))
+    feed._record(update(5, 'in_progress', 'in_progress'))
+    feed._record(update(6, 'in_progress', 'success'))
+
+    assert feed.wait(TABLE, 1) == {'inserted': True, 'updated': {6}}
+    # Изменения забираются один раз.
+    assert feed.wait(TABLE, 0) == {'inserted': False, 'updated': set()}
+    assert feed.metrics == {'events': 3, 'inserts': 1, 'updates': 1, 'reconnects': 0}
+
+
+def test_wait_wakes_up_on_event():
+    feed = connected_feed()
+    threading.Timer(0.05, feed._record, args=(insert(1),)).start()
+    started = time.monotonic()
+
+    assert feed.wait(TABLE, 5)['inserted']
+    assert time.monotonic() - started < 4
+
+
+def test_fallback_interval_forces_full_poll(monkeypatch):
+    monkeypatch.setattr(cdc, "CDC_FALLBACK_INTERVAL", 0.05)
+    feed = connected_feed()
+    feed._record(update(6, 'in_progress', 'success'))
+
+    time.sleep(0.06)
+    assert feed.wait(TABLE, 1) is None
+    # Полный цикл и так перечитает статусы, накопленное сбрасывается.
+    assert feed.wait(TABLE, 0) == {'inserted': False, 'updated': set()}
+
+
+class FakeStream:
+    # Поток binlog без событий: висит, пока его не закроют.
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def __iter__(self):
+        self.closed.wait()
+        return iter(())
+
+    def close(self):
+        self.closed.set()
+
+
+def wait_until(condition):
+    deadline = time.monotonic() + 5
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_reconnect_forces_full_poll(monkeypatch):
+    monkeypatch.setattr(cdc, "CDC_RECONNECT_DELAY", 0)
+    first, second = FakeStream(), FakeStream()
+    streams = iter([first, second])
+    feed = ChangeFeed()
+    monkeypatch.setattr(feed, "_stream", lambda: next(streams))
+    feed.start()
+    wait_until(lambda: feed.connected)
+
+    assert feed.wait(TABLE, 1) is None
+    feed._record(insert(1))
+    assert feed.wait(TABLE, 1) == {'inserted': True, 'updated': set()}
+
+    # Обрыв потока: за время переподключения события могли потеряться.
+    first.close()
+    wait_until(lambda: feed.metrics['reconnects'] == 1 and feed.connected)
+
+    # second не закрываем: иначе поток после теста пойдёт к настоящему mysqld.
+    assert feed.wait(TABLE, 0) is None
+
+
+class FakeCursor:
+    def __init__(self, variables, grants):
+        self.variables = variables
+        self.grants = grants
+
+    def execute(self, query, params=()):
+        if query.startswith("SHOW VARIABLES"):
+            value = self.variables.get(params[0])
+            self._rows = [{'Variable_name': params[0], 'Value': value}] if value is not None else []
+        else:
+            self._rows = [{'Grants for notify@%': grant} for grant in self.grants]
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_check_server_accepts_row_binlog_and_replication_grants():
+    cursor = FakeCursor(
+        {'log_bin': 'ON', 'binlog_format': 'ROW', 'binlog_row_image': 'FULL'},
+        ["GRANT SELECT, REPLICATION SLAVE, REPLICATION CLIENT ON *.* TO `notify`@`%`"],
+    )
+    assert check_server(cursor) == []
+
+
+def test_check_server_reports_what_is_missing():
+    cursor = FakeCursor(
+        {'log_bin': 'ON', 'binlog_format': 'MIXED', 'binlog_row_image': 'MINIMAL'},
+        ["GRANT SELECT ON `core`.* TO `notify`@`%`"],
+    )
+    problems = check_server(cursor)
+
+    assert "binlog_format is MIXED, expected ROW" in problems
+    assert "binlog_row_image is MINIMAL, expected FULL" in problems
+    assert any("REPLICATION SLAVE" in problem for problem in problems)
+    assert any("REPLICATION CLIENT" in problem for problem in problems)
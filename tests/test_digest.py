@@ -0,0 +1,33 @@
+import digest
+from digest import format_digest, should_digest
+
+
+class QueuedDelivery:
+    def __init__(self, depth):
+        self.depth = depth
+
+    def queue_depth(self):
+        return self.depth
+
+
+def test_digest_needs_many_rows_or_a_long_queue(monkeypatch):
+    monkeypatch.setattr(digest, "DIGEST_ROW_THRESHOLD", 10)
+    monkeypatch.setattr(digest, "DIGEST_QUEUE_THRESHOLD", 20)
+
+    assert not should_digest(9, QueuedDelivery(0))
+    assert should_digest(10, QueuedDelivery(0))
+    assert should_digest(2, QueuedDelivery(20))
+    # Одну строку сводкой не заменить, какой бы длинной ни была очередь.
+    assert not should_digest(1, QueuedDelivery(100))
+
+
+def test_format_digest_truncates_long_tables(monkeypatch):
+    monkeypatch.setattr(digest, "DIGEST_MAX_LINES", 2)
+    lines = [(f"#{number}", "Shop", f"-{number} trx", "in_progress") for number in range(1, 5)]
+
+    text = format_digest("ManualCashout", lines)
+
+    assert text.startswith(">*ManualCashout* — 4 new transactions\n")
+    assert "#1  Shop      -1 trx  in_progress" in text
+    assert "#3" not in text
+    assert "…and 2 more" in text
@@ -0,0 +1,44 @@
+import random
+
+from histogram import HdrHistogram
+
+
+def test_small_values_are_exact():
+    histogram = HdrHistogram(sub_bucket_bits=7)
+    for value in range(128):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 63
+    assert histogram.quantile(1.0) == 127
+    assert histogram.count == 128
+
+
+def test_bucket_bounds_contain_value():
+    histogram = HdrHistogram(sub_bucket_bits=7)
+    for value in list(range(1000)) + [2 ** 20, 2 ** 20 + 12345, 10 ** 9]:
+        upper = histogram._upper(histogram._index(value))
+        assert value <= upper
+        assert upper - value <= value * 2 ** -6
+
+
+def test_bucket_indexes_are_monotonic():
+    histogram = HdrHistogram(sub_bucket_bits=4)
+    indexes = [histogram._index(value) for value in range(5000)]
+    assert indexes == sorted(indexes)
+
+
+def test_quantiles_within_relative_error():
+    rng = random.Random(1)
+    values = sorted(int(rng.lognormvariate(6, 1.5)) for _ in range(20000))
+    histogram = HdrHistogram(sub_bucket_bits=7)
+    for value in values:
+        histogram.observe(value)
+
+    for fraction in (0.5, 0.99, 0.999):
+        exact = values[int(fraction * len(values)) - 1]
+        assert abs(histogram.quantile(fraction) - exact) <= max(1, exact * 2 ** -6)
+    assert histogram.quantile(1.0) == values[-1] == histogram.max
+
+
+def test_empty_histogram():
+    assert HdrHistogram().quantile(0.99) == 0
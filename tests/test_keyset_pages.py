@@ -0,0 +1,58 @@
+import keyset_pages
+from keyset_pages import iter_pages
+
+
+class FakeCursor:
+    # Понимает только "... id > %s ORDER BY id ASC LIMIT n" поверх списка id.
+
+    def __init__(self, ids):
+        self.ids = sorted(ids)
+        self.executed = []
+        self._result = []
+
+    def execute(self, query, params):
+        self.executed.append((query, params))
+        limit = int(query.rsplit("LIMIT", 1)[1])
+        last_id = params[-1]
+        self._result = [{'id': row_id} for row_id in self.ids if row_id > last_id][:limit]
+
+    def fetchmany(self, size):
+        rows, self._result = self._result[:size], self._result[size:]
+        return rows
+
+
+def test_pages_are_ascending_and_cover_all_rows(monkeypatch):
+    monkeypatch.setattr(keyset_pages, "POLL_FETCH_SIZE", 2)
+    cursor = FakeCursor(range(1, 12))
+
+    pages = [[row['id'] for row in page] for page in iter_pages(cursor, "SELECT id FROM t WHERE id > %s", (), 0, page_size=5)]
+
+    assert pages == [[1, 2, 3, 4, 5], [6, 7, 8, 9, 10], [11]]
+    assert [params for _, params in cursor.executed] == [(0,), (5,), (10,)]
+
+
+def test_stops_after_short_page_without_extra_query():
+    cursor = FakeCursor([3, 4])
+
+    pages = list(iter_pages(cursor, "SELECT id FROM t WHERE id > %s", (), 2, page_size=5))
+
+    assert pages == [[{'id': 3}, {'id': 4}]]
+    assert len(cursor.executed) == 1
+
+
+def test_full_last_page_ends_with_empty_query():
+    cursor = FakeCursor([1, 2])
+
+    pages = list(iter_pages(cursor, "SELECT id FROM t WHERE id > %s", (), None, page_size=2))
+
+    assert len(pages) == 1
+    assert [params for _, params in cursor.executed] == [(0,), (2,)]
+
+
+def test_params_come_before_last_id():
+    cursor = FakeCursor([10])
+
+    list(iter_pages(cursor, "SELECT id FROM t WHERE a = %s AND id > %s", ("x",), 5))
+
+    assert cursor.executed[0][1] == ("x", 5)
+    assert cursor.executed[0][0].endswith("ORDER BY id ASC LIMIT 500")
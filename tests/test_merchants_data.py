@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+import merchants_data
+from merchants_data import MerchantDirectory
+
+
+class FakeCursor:
+    # merchant_data в памяти; gate задерживает точечный запрос, пока тест его не отпустит.
+
+    def __init__(self, merchants):
+        self.merchants = merchants
+        self.queries = []
+        self.gate = None
+        self.fail = False
+
+    def execute(self, query, params=()):
+        self.queries.append((query, params))
+        if self.fail:
+            raise RuntimeError("connection lost")
+        if self.gate is not None and "WHERE merchant_id = %s" in query:
+            self.gate.wait(5)
+        rows = [{'merchant_id': merchant_id, 'id_merchant': name} for merchant_id, name in self.merchants.items()]
+        if params and "WHERE merchant_id = %s" in query:
+            rows = [row for row in rows if row['merchant_id'] == params[0]]
+        elif params:
+            rows = [row for row in rows if row['merchant_id'] >= params[0]]
+        self._result = rows
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def lookups(self):
+        return [params for query, params in self.queries if "WHERE merchant_id = %s" in query]
+
+
+@pytest.fixture
+def cursor(monkeypatch):
+    fake = FakeCursor({1: "Shop"})
+
+    @contextmanager
+    def db_cursor(database=None):
+        yield fake
+
+    monkeypatch.setattr(merchants_data, "db_cursor", db_cursor)
+    return fake
+
+
+def test_refresh_reads_only_new_merchants(cursor):
+    directory = MerchantDirectory()
+    directory.refresh(full=True)
+    cursor.merchants[2] = "Store"
+
+    directory.refresh()
+
+    assert cursor.queries[-1][1] == (1,)
+    assert (directory.get(1), directory.get(2)) == ("Shop", "Store")
+    assert cursor.lookups() == []
+
+
+def test_concurrent_misses_share_one_lookup(cursor):
+    cursor.merchants[5] = "Late"
+    cursor.gate = threading.Event()
+    directory = MerchantDirectory()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(directory.get(5, 'Unknown'))) for _ in range(8)]
+
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while directory.metrics['misses'] < 8 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    # Все промахи уже посчитаны; даём потокам дойти до ожидания первого запроса.
+    time.sleep(0.1)
+    cursor.gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ["Late"] * 8
+    assert cursor.lookups() == [(5,)]
+
+
+def test_unknown_merchant_is_cached_for_negative_ttl(cursor, monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(merchants_data.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(merchants_data, "MERCHANT_NEGATIVE_TTL", 10)
+    directory = MerchantDirectory()
+
+    assert directory.get(9, 'Unknown') == 'Unknown'
+    assert directory.get(9, 'Unknown') == 'Unknown'
+    assert len(cursor.lookups()) == 1
+    assert directory.metrics['negative_hits'] == 1
+
+    cursor.merchants[9] = "New"
+    clock[0] += 11
+    assert directory.get(9, 'Unknown') == "New"
+    assert len(cursor.lookups()) == 2
+
+
+def test_database_error_is_not_cached_as_unknown(cursor):
+    directory = MerchantDirectory()
+    cursor.fail = True
+    assert directory.get(9, 'Unknown') == 'Unknown'
+
+    cursor.fail = False
+    cursor.merchants[9] = "Back"
+    assert directory.get(9, 'Unknown') == "Back"
@@ -0,0 +1,41 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import notification_latency
+from notification_latency import mark_seen, record_enqueued
+
+
+def test_created_at_feeds_created_to_stages(monkeypatch):
+    monkeypatch.setattr(notification_latency, "latency_histograms", {})
+    row = {'id': 1, 'created_at': datetime.now() - timedelta(seconds=2)}
+    mark_seen([row])
+    ts = Future()
+
+    record_enqueued("exchange_transactions", row, ts)
+    ts.set_result("1.000001")
+
+    stages = notification_latency.get_notification_latency()["exchange_transactions"]
+    assert set(stages) == {'created_to_seen', 'created_to_enqueued', 'created_to_acked', 'seen_to_acked'}
+    assert stages['created_to_acked']['max_ms'] >= 2000
+
+
+def test_row_without_created_at_only_records_seen_to_acked(monkeypatch):
+    monkeypatch.setattr(notification_latency, "latency_histograms", {})
+    row = {'id': 1}
+    mark_seen([row])
+    ts = Future()
+
+    record_enqueued("m", row, ts)
+    ts.set_result("1.000001")
+
+    assert set(notification_latency.get_notification_latency()["m"]) == {'seen_to_acked'}
+
+
+def test_unacked_message_is_not_observed(monkeypatch):
+    monkeypatch.setattr(notification_latency, "latency_histograms", {})
+    ts = Future()
+
+    record_enqueued("m", {'id': 1}, ts)
+    ts.set_result(None)
+
+    assert notification_latency.get_notification_latency() == {}
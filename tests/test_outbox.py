@@ -0,0 +1,198 @@
+import sqlite3
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from slack_sdk.errors import SlackApiError
+
+import outbox as outbox_module
+from conftest import wait_for
+from outbox import Outbox
+from slack_delivery import SlackDelivery
+
+
+class FlakyClient:
+    # Вместо WebClient: тексты из fail отвечают ошибкой Slack, остальные получают ts.
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    def chat_postMessage(self, channel, text, thread_ts=None):
+        self.calls.append((text, thread_ts))
+        if text in self.fail:
+            raise SlackApiError("internal_error", SimpleNamespace(status_code=200, headers={}))
+        return {'ts': f"ts{len(self.calls)}"}
+
+
+class StuckDelivery:
+    # Очередь, которая ничего не отправляет: как будто процесс упал до ответа Slack.
+
+    def post_message(self, channel, text, thread_ts=None, ordering_key=None):
+        return Future()
+
+
+def unacked(outbox):
+    return outbox._conn.execute(
+        "SELECT COUNT(*) FROM outbox WHERE monitor = ? AND ts IS NULL", (outbox.monitor,)
+    ).fetchone()[0]
+
+
+def test_same_key_is_posted_once(fake_slack, delivery, state_path):
+    outbox = Outbox("test", delivery, state_path)
+
+    first = outbox.post("t", 1, "new", "C1", "hello").result()
+    wait_for(lambda: unacked(outbox) == 0)
+    second = outbox.post("t", 1, "new", "C1", "hello again").result()
+
+    assert first == second
+    assert len(fake_slack.calls_for('chat.postMessage', channel='C1')) == 1
+
+
+def test_drain_resends_after_crash_and_dedupes(fake_slack, delivery, state_path):
+    Outbox("test", StuckDelivery(), state_path).post("t", 1, "new", "C1", "hello")
+
+    outbox = Outbox("test", delivery, state_path)
+    outbox.drain(force=True)
+    wait_for(lambda: unacked(outbox) == 0)
+    outbox.post("t", 1, "new", "C1", "hello")
+    outbox.drain(force=True)
+
+    assert len(fake_slack.calls_for('chat.postMessage', text='hello')) == 1
+
+
+def test_reply_waits_for_failed_parent(state_path):
+    client = FlakyClient(fail={'parent'})
+    outbox = Outbox("test", SlackDelivery(client, workers=2), state_path)
+
+    parent = outbox.post("t", 1, "new", "C1", "parent")
+    reply = outbox.post("t", 1, "success", "C1", "reply", reply=True, thread_ts=parent)
+
+    assert parent.result() is None
+    assert reply.result() is None
+    wait_for(lambda: not outbox._in_flight)
+    assert client.calls == [('parent', None)]
+
+    client.fail.clear()
+    outbox.drain(force=True)
+    wait_for(lambda: unacked(outbox) == 0)
+    assert client.calls[1:] == [('parent', None), ('reply', 'ts2')]
+
+
+def test_digest_reply_is_drained_into_digest_thread(state_path):
+    client = FlakyClient(fail={'#2: success'})
+    outbox = Outbox("test", SlackDelivery(client, workers=2), state_path)
+
+    digest_ts = outbox.post("t:digest", 1, "digest", "C1", "digest").result()
+    outbox.post(
+        "t", 2, "success", "C1", "#2: success", reply=True, thread_ts=digest_ts, parent=("t:digest", 1)
+    ).result()
+    wait_for(lambda: not outbox._in_flight)
+
+    # Перезапуск: ts сводки известен только по ключу родителя в outbox.
+    client.fail.clear()
+    restarted = Outbox("test", SlackDelivery(client, workers=2), state_path)
+    restarted.drain(force=True)
+    wait_for(lambda: unacked(restarted) == 0)
+
+    assert client.calls[-1] == ('#2: success', digest_ts)
+
+
+def test_gives_up_and_purges(monkeypatch, state_path):
+    monkeypatch.setattr(outbox_module, "OUTBOX_MAX_ATTEMPTS", 2)
+    client = FlakyClient(fail={'hello'})
+    outbox = Outbox("test", SlackDelivery(client, workers=1), state_path)
+
+    outbox.post("t", 1, "new", "C1", "hello").result()
+    wait_for(lambda: not outbox._in_flight)
+    outbox.drain(force=True)
+    wait_for(lambda: outbox.metrics['gave_up'] == 1)
+
+    assert outbox.get_metrics() == {'gave_up': 1, 'unacked': 0}
+    assert outbox.post("t", 1, "new", "C1", "hello").result() is None
+    assert len(client.calls) == 2
+
+    monkeypatch.setattr(outbox_module, "OUTBOX_RETENTION", -1)
+    outbox.drain(force=True)
+    assert outbox._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0] == 0
+
+
+def test_reply_with_an_earlier_status_still_goes_to_the_thread(fake_slack, delivery, state_path):
+    outbox = Outbox("test", delivery, state_path)
+
+    parent = outbox.post("t", 1, "in_progress", "C1", "parent").result()
+    outbox.post("t", 1, "pending", "C1", "pending", reply=True).result()
+    # Статус вернулся к тому, с которым ушёл родитель: это всё равно новый ответ.
+    reply = outbox.post("t", 1, "in_progress", "C1", "in_progress again", reply=True).result()
+
+    assert reply is not None and reply != parent
+    assert [call['params']['text'] for call in fake_slack.calls_for('chat.postMessage', thread_ts=parent)] == [
+        "pending",
+        "in_progress again",
+    ]
+
+
+def test_top_level_message_is_not_reposted_after_status_change(fake_slack, delivery, state_path):
+    # Падение до сдвига водяного знака: строку перечитали уже с другим статусом.
+    Outbox("test", StuckDelivery(), state_path).post("t", 1, "in_progress", "C1", "in progress")
+
+    outbox = Outbox("test", delivery, state_path)
+    outbox.post("t", 1, "success", "C1", "success").result()
+    outbox.drain(force=True)
+    wait_for(lambda: unacked(outbox) == 0)
+
+    assert [call['params']['text'] for call in fake_slack.calls_for('chat.postMessage', channel='C1')] == ["in progress"]
+
+
+def test_old_key_schema_is_migrated(state_path):
+    conn = sqlite3.connect(state_path)
+    conn.execute("""
+        CREATE TABLE outbox (
+            monitor TEXT NOT NULL,
+            source_table TEXT NOT NULL,
+            transaction_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            is_reply INTEGER NOT NULL,
+            channel TEXT NOT NULL,
+            text TEXT NOT NULL,
+            ts TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (monitor, source_table, transaction_id, status)
+        )
+    """)
+    conn.executemany(
+        "INSERT INTO outbox VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            ("test", "t", 1, "in_progress", 0, "C1", "parent", "1.000001", 0, 1.0),
+            ("test", "t", 1, "success", 0, "C1", "parent again", None, 0, 2.0),
+            ("test", "t", 1, "pending", 1, "C1", "reply", "1.000002", 0, 3.0),
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+    outbox = Outbox("test", StuckDelivery(), state_path)
+
+    rows = outbox._conn.execute(
+        "SELECT is_reply, status, text, ts, parent_table FROM outbox ORDER BY created_at"
+    ).fetchall()
+    assert rows == [(0, "", "parent", "1.000001", None), (1, "pending", "reply", "1.000002", None)]
+    assert outbox.post("t", 1, "success", "C1", "parent again").result() == "1.000001"
+
+
+def test_reply_is_given_up_with_its_parent(monkeypatch, state_path):
+    monkeypatch.setattr(outbox_module, "OUTBOX_MAX_ATTEMPTS", 2)
+    client = FlakyClient(fail={'parent'})
+    outbox = Outbox("test", SlackDelivery(client, workers=1), state_path)
+
+    outbox.post("t", 1, "new", "C1", "parent").result()
+    wait_for(lambda: not outbox._in_flight)
+    outbox.drain(force=True)
+    wait_for(lambda: outbox.metrics['gave_up'] == 1)
+
+    # Родителя больше не отправят, значит и ответу ждать нечего.
+    assert outbox.post("t", 1, "success", "C1", "reply", reply=True).result() is None
+    outbox.drain(force=True)
+
+    assert outbox.get_metrics() == {'gave_up': 2, 'unacked': 0}
+    assert [text for text, _ in client.calls] == ['parent', 'parent']
@@ -0,0 +1,33 @@
+import poll_interval
+from poll_interval import AdaptivePollInterval, get_poll_interval_metrics
+
+
+def test_idle_cycles_back_off_to_max(monkeypatch):
+    monkeypatch.setattr(poll_interval, "POLL_INTERVAL_MIN", 1)
+    monkeypatch.setattr(poll_interval, "POLL_INTERVAL_MAX", 5)
+    interval = AdaptivePollInterval("test_backoff")
+
+    assert [interval.next(0) for _ in range(4)] == [2, 4, 5, 5]
+    assert interval.next(3) == 1
+    assert interval.metrics == {'active_cycles': 1, 'idle_cycles': 4}
+
+
+def test_per_monitor_override(monkeypatch):
+    monkeypatch.setenv("POLL_INTERVAL_MIN_TEST_OVERRIDE", "0.5")
+    monkeypatch.setenv("POLL_INTERVAL_MAX_TEST_OVERRIDE", "0.25")
+    interval = AdaptivePollInterval("test_override")
+
+    # Потолок не бывает ниже минимума.
+    assert (interval.min_interval, interval.max_interval) == (0.5, 0.5)
+    assert interval.next(0) == 0.5
+
+
+def test_metrics_are_registered_by_monitor():
+    interval = AdaptivePollInterval("test_metrics")
+    interval.next(1)
+
+    assert get_poll_interval_metrics()["test_metrics"] == {
+        'active_cycles': 1,
+        'idle_cycles': 0,
+        'interval': interval.min_interval,
+    }
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+import pytest
+
+import project_cache
+from project_cache import get_project_cache_metrics, get_project_names
+
+
+class FakeCursor:
+    def __init__(self, projects):
+        self.projects = projects
+        self.queries = []
+
+    def execute(self, query, params):
+        self.queries.append(list(params))
+        self._rows = [{'id': project_id, 'name': self.projects[project_id]} for project_id in params if project_id in self.projects]
+
+    def fetchall(self):
+        return self._rows
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(project_cache, "_project_names", OrderedDict())
+    monkeypatch.setattr(project_cache, "project_cache_metrics", dict.fromkeys(project_cache.project_cache_metrics, 0))
+    monkeypatch.setattr("project_cache.time.monotonic", lambda: now[0])
+    return now
+
+
+def test_misses_are_loaded_with_one_query(clock):
+    cursor = FakeCursor({1: "one", 2: "two"})
+
+    assert get_project_names(cursor, [1, 2, 1]) == {1: "one", 2: "two"}
+    assert get_project_names(cursor, [2, 1]) == {1: "one", 2: "two"}
+
+    assert len(cursor.queries) == 1
+    assert sorted(cursor.queries[0]) == [1, 2]
+    metrics = get_project_cache_metrics()
+    assert (metrics['misses'], metrics['hits'], metrics['queries']) == (2, 2, 1)
+
+
+def test_entries_expire_after_ttl(clock, monkeypatch):
+    monkeypatch.setattr(project_cache, "PROJECT_CACHE_TTL", 60)
+    cursor = FakeCursor({1: "one"})
+    get_project_names(cursor, [1])
+
+    clock[0] += 30
+    get_project_names(cursor, [1])
+    cursor.projects[1] = "renamed"
+    clock[0] += 61
+
+    assert get_project_names(cursor, [1]) == {1: "renamed"}
+    assert len(cursor.queries) == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock, monkeypatch):
+    monkeypatch.setattr(project_cache, "PROJECT_CACHE_MAX_SIZE", 2)
+    cursor = FakeCursor({1: "one", 2: "two", 3: "three"})
+    get_project_names(cursor, [1])
+    get_project_names(cursor, [2])
+    get_project_names(cursor, [1])
+    get_project_names(cursor, [3])
+
+    assert list(project_cache._project_names) == [1, 3]
+    assert get_project_cache_metrics()['evictions'] == 1
+
+
+def test_unknown_project_is_cached_for_negative_ttl(clock, monkeypatch):
+    monkeypatch.setattr(project_cache, "PROJECT_CACHE_NEGATIVE_TTL", 10)
+    cursor = FakeCursor({})
+
+    assert get_project_names(cursor, [7]) == {}
+    assert get_project_names(cursor, [7]) == {}
+    assert len(cursor.queries) == 1
+    assert get_project_cache_metrics()['negative_hits'] == 1
+
+    # Проект появился: после короткого TTL база спрашивается снова.
+    cursor.projects[7] = "seven"
+    clock[0] += 11
+    assert get_project_names(cursor, [7]) == {7: "seven"}
+    assert len(cursor.queries) == 2
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta
+
+import project_transactions_data
+from project_transactions_data import ProjectTransactionsIndex
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+class FakeCursor:
+    # core.project_transactions в памяти; понимает три запроса ProjectTransactionsIndex.
+
+    def __init__(self, transactions):
+        self.transactions = transactions
+        self.queries = []
+
+    def execute(self, query, params):
+        self.queries.append(params)
+        rows = sorted(self.transactions, key=lambda row: row['id'])
+        if "amount = %s" in query:
+            amount, merchant_id, created_at = params
+            matched = [
+                row for row in rows
+                if (row['amount'], row['owner_merchant_id'], row['created_at']) == (amount, merchant_id, created_at)
+            ]
+            self._result = matched[-1:]
+            return
+
+        if "created_at < %s" in query:
+            start, end, last_id, after_id, limit = params
+            matched = [row for row in rows if start <= row['created_at'] < end and row['id'] <= last_id]
+        else:
+            start, after_id, limit = params
+            matched = [row for row in rows if row['created_at'] >= start]
+        self._result = [row for row in matched if row['id'] > after_id][:limit]
+
+    def fetchall(self):
+        return self._result
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+
+def transaction(transaction_id, minutes, amount=10, merchant_id=1):
+    return {'id': transaction_id, 'owner_merchant_id': merchant_id, 'amount': amount, 'created_at': T0 + timedelta(minutes=minutes)}
+
+
+def row(minutes, amount=10, merchant_id=1):
+    return {'owner_merchant_id': merchant_id, 'amount': amount, 'created_at': T0 + timedelta(minutes=minutes)}
+
+
+def test_refresh_reads_only_new_ids_in_pages(monkeypatch):
+    monkeypatch.setattr(project_transactions_data, "PROJECT_TRANSACTIONS_PAGE_SIZE", 2)
+    cursor = FakeCursor([transaction(1, 0, amount=1), transaction(2, 1, amount=2), transaction(3, 2, amount=3)])
+    index = ProjectTransactionsIndex()
+
+    index.refresh(cursor, [row(0, amount=1)])
+    assert index.last_id == 3
+    assert [params[-2] for params in cursor.queries] == [0, 2]
+
+    cursor.transactions.append(transaction(4, 3, amount=4))
+    cursor.queries.clear()
+    index.refresh(cursor, [row(3, amount=4)])
+
+    assert cursor.queries == [(T0, 3, 2)]
+    assert index.find_real_transaction_id(cursor, row(3, amount=4)) == 4
+
+
+def test_older_row_back_fills_only_the_missing_range():
+    cursor = FakeCursor([transaction(1, -30, amount=5), transaction(2, 0, amount=6)])
+    index = ProjectTransactionsIndex()
+    index.refresh(cursor, [row(0, amount=6)])
+    assert index.find_real_transaction_id(cursor, row(-30, amount=5)) == 1
+    index.index.pop((5, 1, T0 - timedelta(minutes=30)))
+    cursor.queries.clear()
+
+    index.refresh(cursor, [row(-30, amount=5)])
+
+    start, end, last_id, after_id, _ = cursor.queries[0]
+    assert (start, end, last_id, after_id) == (T0 - timedelta(minutes=30), T0, 2, 0)
+    assert index.covered_from == T0 - timedelta(minutes=30)
+    queries = len(cursor.queries)
+    assert index.find_real_transaction_id(cursor, row(-30, amount=5)) == 1
+    assert len(cursor.queries) == queries
+
+
+def test_window_is_pruned_behind_the_batch(monkeypatch):
+    monkeypatch.setattr(project_transactions_data, "PROJECT_TRANSACTIONS_WINDOW", 600)
+    cursor = FakeCursor([transaction(1, 0, amount=1), transaction(2, 60, amount=2)])
+    index = ProjectTransactionsIndex()
+    index.refresh(cursor, [row(0, amount=1)])
+
+    index.refresh(cursor, [row(60, amount=2)])
+
+    assert index.covered_from == T0 + timedelta(minutes=50)
+    assert list(index.index.values()) == [2]
+
+
+def test_late_commit_is_found_by_point_query_and_cached():
+    cursor = FakeCursor([])
+    index = ProjectTransactionsIndex()
+    index.refresh(cursor, [row(0)])
+    assert index.find_real_transaction_id(cursor, row(0)) is None
+
+    # Транзакция ядра закоммитилась с меньшим id уже после того, как окно дочитали.
+    cursor.transactions.append(transaction(7, 0))
+    assert index.find_real_transaction_id(cursor, row(0)) == 7
+    queries = len(cursor.queries)
+    assert index.find_real_transaction_id(cursor, row(0)) == 7
+    assert len(cursor.queries) == queries
+
+
+def test_newest_transaction_wins_for_equal_keys():
+    cursor = FakeCursor([transaction(1, 0), transaction(2, 0)])
+    index = ProjectTransactionsIndex()
+
+    index.refresh(cursor, [row(0)])
+
+    assert index.find_real_transaction_id(cursor, row(0)) == 2
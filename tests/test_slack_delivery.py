@@ -0,0 +1,53 @@
+from slack_sdk import WebClient
+
+from fake_slack import FakeSlack
+from slack_delivery import SlackDelivery, TokenBucket
+
+
+def test_messages_with_one_ordering_key_keep_their_order(fake_slack, delivery):
+    futures = [
+        delivery.post_message("C1", f"message {number}", ordering_key=("C1", 7))
+        for number in range(20)
+    ]
+    assert all(future.result(timeout=10) for future in futures)
+
+    texts = [call['params']['text'] for call in fake_slack.calls_for('chat.postMessage', channel='C1')]
+    assert texts == [f"message {number}" for number in range(20)]
+
+
+def test_reply_is_posted_in_parent_thread(fake_slack, delivery):
+    parent = delivery.post_message("C1", "parent", ordering_key=("C1", 1))
+    reply = delivery.post_message("C1", "reply", thread_ts=parent, ordering_key=("C1", 1))
+
+    assert reply.result(timeout=10)
+    assert [call['params']['text'] for call in fake_slack.calls_for('chat.postMessage', thread_ts=parent.result())] == ["reply"]
+
+
+def test_rate_limited_message_is_retried():
+    fake = FakeSlack(rate_limit=0.5, retry_after=0, seed=1).start()
+    try:
+        delivery = SlackDelivery(WebClient(token="xoxb-test", base_url=fake.url), workers=1)
+        futures = [delivery.post_message("C1", f"message {number}") for number in range(5)]
+
+        assert all(future.result(timeout=10) for future in futures)
+        assert delivery.metrics['rate_limited'] > 0
+        assert fake.count('chat.postMessage') == 5
+    finally:
+        fake.stop()
+
+
+def test_token_bucket_pause_blocks_until_retry_after(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr("slack_delivery.time.monotonic", lambda: clock[0])
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr("slack_delivery.time.sleep", sleep)
+    bucket = TokenBucket(rate=1, burst=2)
+    bucket.pause(3)
+    bucket.acquire()
+
+    assert sum(sleeps) >= 3
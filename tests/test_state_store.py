@@ -0,0 +1,101 @@
+import sqlite3
+
+from pending_correlations import PendingCorrelations
+from state_store import StateStore
+
+
+def test_nothing_is_written_before_flush(state_path):
+    store = StateStore("test", state_path)
+    store.save_watermark(10)
+    store.save_status(1, "in_progress")
+
+    reopened = StateStore("test", state_path)
+    assert reopened.load_watermark() is None
+    assert reopened.load_tracked() == {}
+
+
+def test_flush_persists_watermark_and_tracked(state_path):
+    store = StateStore("test", state_path)
+    store.save_watermark(10)
+    store.save_status(1, "in_progress")
+    store.save_tracked_at(1, 100.0)
+    store.save_message_ts(1, "1.000001")
+    store.save_status(2, "pending")
+    store.save_tracked_at(2, 50.0)
+    store.save_digest_id(2, 2)
+    store.flush()
+
+    reopened = StateStore("test", state_path)
+    assert reopened.load_watermark() == 10
+    # Старые записи первыми: в этом порядке их ждёт TrackedTransactions.
+    assert list(reopened.load_tracked().items()) == [
+        (2, (None, "pending", 50.0, 2)),
+        (1, ("1.000001", "in_progress", 100.0, None)),
+    ]
+
+
+def test_forget_removes_tracked(state_path):
+    store = StateStore("test", state_path)
+    store.save_status(1, "in_progress")
+    store.flush()
+    store.forget(1)
+    store.flush()
+
+    assert StateStore("test", state_path).load_tracked() == {}
+
+
+def test_monitors_do_not_share_state(state_path):
+    StateStore("a", state_path).save_watermark(1)
+    store = StateStore("b", state_path)
+    store.save_watermark(2)
+    store.flush()
+
+    assert StateStore("a", state_path).load_watermark() is None
+
+
+def test_old_tracked_messages_schema_is_migrated(state_path):
+    conn = sqlite3.connect(state_path)
+    conn.execute("""
+        CREATE TABLE tracked_messages (
+            monitor TEXT NOT NULL,
+            transaction_id INTEGER NOT NULL,
+            ts TEXT,
+            status TEXT,
+            PRIMARY KEY (monitor, transaction_id)
+        )
+    """)
+    conn.execute("INSERT INTO tracked_messages VALUES ('test', 1, '1.000001', 'in_progress')")
+    conn.commit()
+    conn.close()
+
+    store = StateStore("test", state_path)
+    ts, status, tracked_at, digest_id = store.load_tracked()[1]
+    store.flush()
+
+    assert (ts, status, digest_id) == ("1.000001", "in_progress", None)
+    # Время постановки назначается один раз и дальше не сдвигается.
+    assert StateStore("test", state_path).load_tracked()[1][2] == tracked_at
+
+
+def test_pending_correlations_survive_restart(state_path):
+    store = StateStore("test", state_path)
+    pending = PendingCorrelations(store)
+    for transaction_id in (1, 2, 3):
+        pending.add({'id': transaction_id})
+    pending.record_failure(2)
+    pending.remove(3)
+    store.save_watermark(3)
+    store.flush()
+
+    restarted = StateStore("test", state_path)
+    saved = restarted.load_pending()
+    assert set(saved) == {1, 2}
+    assert saved[2][0] == 2
+
+    # Строки 1 в таблице больше нет — её ждать незачем.
+    restored = PendingCorrelations(restarted)
+    restored.restore([{'id': 2}], saved)
+    restarted.flush()
+
+    assert 2 in restored and 1 not in restored
+    assert set(StateStore("test", state_path).load_pending()) == {2}
@@ -0,0 +1,73 @@
+import status_refresh
+from status_refresh import fetch_changed_statuses, select_by_ids
+
+
+class FakeCursor:
+    # Понимает "SELECT колонки FROM t WHERE id IN (...)" поверх словаря строк.
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    def execute(self, query, params):
+        columns = query.split("SELECT ", 1)[1].split(" FROM", 1)[0].split(", ")
+        self.queries.append((columns, params))
+        self._result = [
+            {column: self.rows[row_id][column] for column in columns}
+            for row_id in params if row_id in self.rows
+        ]
+
+    def fetchall(self):
+        return self._result
+
+
+ROWS = {
+    1: {'id': 1, 'status': 'in_progress', 'hash_transaction': 'a'},
+    2: {'id': 2, 'status': 'success', 'hash_transaction': 'b'},
+    3: {'id': 3, 'status': 'rejected', 'hash_transaction': 'c'},
+}
+
+
+def test_only_changed_rows_are_returned():
+    cursor = FakeCursor(ROWS)
+
+    rows = fetch_changed_statuses(cursor, "t", {1: 'in_progress', 2: 'in_progress', 3: None})
+
+    assert sorted(row['id'] for row in rows) == [2, 3]
+    assert len(cursor.queries) == 1
+
+
+def test_extra_columns_are_read_only_for_changed_rows():
+    cursor = FakeCursor(ROWS)
+
+    rows = fetch_changed_statuses(cursor, "t", {1: 'in_progress', 2: 'in_progress'}, ('id', 'status', 'hash_transaction'))
+
+    assert rows == [ROWS[2]]
+    assert cursor.queries[1] == (['id', 'status', 'hash_transaction'], (2,))
+
+
+def test_nothing_changed_skips_second_query():
+    cursor = FakeCursor(ROWS)
+
+    assert fetch_changed_statuses(cursor, "t", {1: 'in_progress'}, ('id', 'status', 'hash_transaction')) == []
+    assert len(cursor.queries) == 1
+
+
+def test_ids_are_read_in_chunks(monkeypatch):
+    monkeypatch.setattr(status_refresh, "STATUS_REFRESH_CHUNK_SIZE", 2)
+    cursor = FakeCursor(ROWS)
+
+    rows = select_by_ids(cursor, "t", ('id', 'status'), [1, 2, 3])
+
+    assert [row['id'] for row in rows] == [1, 2, 3]
+    assert [params for _, params in cursor.queries] == [(1, 2), (3,)]
+
+
+def test_column_params_come_before_ids():
+    cursor = FakeCursor(ROWS)
+    cursor.execute = lambda query, params: cursor.queries.append((query, params))
+    cursor.fetchall = lambda: []
+
+    select_by_ids(cursor, "t", ('id', '(risk_score >= %s) AS match_0'), [5], (80,))
+
+    assert cursor.queries[0][1] == (80, 5)
@@ -0,0 +1,74 @@
+import argparse
+from types import SimpleNamespace
+
+import pytest
+
+import deposit_stream
+import supervisor
+from supervisor import parse_monitors, run_deposit_stream, supervise
+
+
+class Stop(Exception):
+    pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    # Останавливает supervise() после пятой паузы перед перезапуском.
+    recorded = []
+
+    def sleep(seconds):
+        recorded.append(seconds)
+        if len(recorded) == 5:
+            raise Stop()
+
+    monkeypatch.setattr(supervisor.time, "sleep", sleep)
+    monkeypatch.setattr(supervisor, "SUPERVISOR_BACKOFF_BASE", 1)
+    monkeypatch.setattr(supervisor, "SUPERVISOR_BACKOFF_MAX", 5)
+    monkeypatch.setitem(supervisor.monitor_status, "test", {'restarts': 0})
+    return recorded
+
+
+def crash():
+    raise RuntimeError("boom")
+
+
+def test_restart_delay_doubles_up_to_max(sleeps):
+    with pytest.raises(Stop):
+        supervise("test", crash)
+
+    assert sleeps == [1, 2, 4, 5, 5]
+    assert supervisor.monitor_status["test"]['restarts'] == 5
+
+
+def test_healthy_run_resets_backoff(sleeps, monkeypatch):
+    clock = [0.0]
+    durations = iter([0, 0, 0, supervisor.SUPERVISOR_HEALTHY_RUN, 0])
+    monkeypatch.setattr(supervisor.time, "monotonic", lambda: clock[0])
+
+    def run():
+        clock[0] += next(durations)
+        raise RuntimeError("boom")
+
+    with pytest.raises(Stop):
+        supervise("test", run)
+
+    assert sleeps == [1, 2, 4, 1, 2]
+
+
+def test_deposit_subscribers_are_deduplicated(monkeypatch):
+    shared = SimpleNamespace(name="risk_score")
+    modules = {'risk_score': SimpleNamespace(subscriber=shared), 'users': SimpleNamespace(subscriber=shared)}
+    started = []
+    monkeypatch.setattr(supervisor.importlib, "import_module", modules.__getitem__)
+    monkeypatch.setattr(deposit_stream, "monitor_transactions", started.append)
+
+    run_deposit_stream(["risk_score", "users"])
+
+    assert started == [[shared]]
+
+
+def test_unknown_monitor_is_rejected():
+    assert parse_monitors("cashouts, users") == ["cashouts", "users"]
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_monitors("cashouts,nope")
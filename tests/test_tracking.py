@@ -0,0 +1,51 @@
+import time
+
+import tracking
+from tracking import TrackedTransactions
+
+
+def test_terminal_status_is_evicted():
+    evicted = []
+    transactions = TrackedTransactions(on_evict=evicted.append)
+
+    transactions.track(1, "ts1", "in_progress")
+    transactions.set_status(1, "success")
+    transactions.track(2, "ts2", "rejected")
+
+    assert len(transactions) == 0
+    assert evicted == [1, 2]
+    assert transactions.get_metrics()['evicted_terminal'] == 2
+
+
+def test_oldest_entries_are_evicted_on_overflow(monkeypatch):
+    monkeypatch.setattr(tracking, "TRACKING_MAX_SIZE", 2)
+    transactions = TrackedTransactions()
+
+    for transaction_id in (1, 2, 3):
+        transactions.track(transaction_id, f"ts{transaction_id}", "in_progress")
+
+    assert 1 not in transactions
+    assert set(transactions.known_statuses()) == {2, 3}
+    assert transactions.get_metrics()['evicted_overflow'] == 1
+
+
+def test_expiry_uses_restored_tracked_at(monkeypatch):
+    monkeypatch.setattr(tracking, "TRACKING_MAX_AGE", 60)
+    transactions = TrackedTransactions()
+
+    transactions.track(1, "ts1", "in_progress", tracked_at=time.time() - 120)
+    transactions.track(2, "ts2", "in_progress")
+    transactions.evict_expired()
+
+    assert 1 not in transactions
+    assert 2 in transactions
+    assert transactions.get_metrics()['evicted_expired'] == 1
+
+
+def test_digest_id_is_kept():
+    transactions = TrackedTransactions()
+    transactions.track(5, "ts", "in_progress", digest_id=3)
+    transactions.track(6, "ts6", "in_progress")
+
+    assert transactions.digest_id(5) == 3
+    assert transactions.digest_id(6) is None
@@ -0,0 +1,210 @@
+import re
+from contextlib import contextmanager
+from functools import partial
+
+import pytest
+
+import digest
+import transaction_stream
+from conftest import wait_for
+from keyset_pages import iter_pages
+from outbox import Outbox
+from state_store import StateStore
+from tracking import TrackedTransactions
+from transaction_stream import Subscriber, TransactionStream
+
+TABLE = "transactions"
+COLUMNS = ('id', 'status', 'amount', 'risk', 'owner_merchant_id', 'project_id')
+# Условия подписчиков — SQL для базы и то же самое на Python для FakeCursor.
+CONDITIONS = {
+    "amount >= 100": lambda row: row['amount'] >= 100,
+    "risk >= 50": lambda row: row['risk'] >= 50,
+}
+
+
+class StopStream(Exception):
+    pass
+
+
+class FakeCursor:
+    # Понимает MAX(id), COUNT(*) и запрос страницы потока с колонками match_N.
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.pages = []
+        self._result = []
+
+    def execute(self, query, params=()):
+        if "MAX(id)" in query:
+            self._result = [{'max_id': max(row['id'] for row in self.rows)}]
+        elif "COUNT(*)" in query:
+            self._result = [{'count': 0}]
+        else:
+            matches = re.findall(r"\((.+?)\) AS (match_\d+)", query)
+            limit = int(query.rsplit("LIMIT", 1)[1])
+            upper_id, last_id = params[0], params[-1]
+            result = []
+            for row in self.rows:
+                if not last_id < row['id'] <= upper_id:
+                    continue
+                flags = {name: int(CONDITIONS[condition](row)) for condition, name in matches}
+                if any(flags.values()):
+                    result.append(dict(row, **flags))
+            self._result = result[:limit]
+            self.pages.append([row['id'] for row in self._result])
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchmany(self, size):
+        rows, self._result = self._result[:size], self._result[size:]
+        return rows
+
+
+class FakeIndex:
+    # Каждая строка сразу находит пару, кроме перечисленных в missing.
+    missing = set()
+
+    def refresh(self, cursor, rows):
+        pass
+
+    def find_real_transaction_id(self, cursor, row):
+        return None if row['id'] in self.missing else row['id'] + 1000
+
+
+@pytest.fixture
+def run_stream(monkeypatch, delivery, state_path):
+    def run(rows, subscribers, watermark):
+        cursor = FakeCursor(rows)
+
+        @contextmanager
+        def db_cursor():
+            yield cursor
+
+        def wait_for_changes(table, timeout):
+            raise StopStream()
+
+        monkeypatch.setattr(transaction_stream, "db_cursor", db_cursor)
+        monkeypatch.setattr(transaction_stream, "wait_for_changes", wait_for_changes)
+        monkeypatch.setattr(transaction_stream, "get_merchants_data", lambda: {})
+        monkeypatch.setattr(transaction_stream, "get_project_names", lambda cursor, ids: {})
+        monkeypatch.setattr(transaction_stream, "fetch_changed_statuses", lambda *args: [])
+        monkeypatch.setattr(transaction_stream, "ProjectTransactionsIndex", FakeIndex)
+
+        stream = TransactionStream("stream", TABLE, COLUMNS, "amount", "currency", "test")
+        stream.state_store = StateStore("stream", state_path)
+        stream.state_store.save_watermark(watermark)
+        stream.state_store.flush()
+        for subscriber in subscribers:
+            subscriber.state_store = StateStore(subscriber.name, state_path)
+            subscriber.outbox = Outbox(subscriber.name, delivery, state_path)
+            subscriber.tracked_transactions = TrackedTransactions()
+
+        with pytest.raises(StopStream):
+            stream.run(subscribers)
+        return cursor
+
+    return run
+
+
+def make_subscriber(name, channel, condition, render_digest_amount=None):
+    return Subscriber(
+        name,
+        TABLE,
+        channel,
+        name,
+        lambda transaction, project_name, merchant_name, real_transaction_id: f"{name} #{transaction['id']} -> {real_transaction_id}",
+        lambda transaction: transaction['status'],
+        condition,
+        render_digest_amount=render_digest_amount,
+    )
+
+
+def posted(fake_slack, channel):
+    return sorted(call['params']['text'] for call in fake_slack.calls_for('chat.postMessage', channel=channel))
+
+
+def test_rows_are_dispatched_by_match_columns(run_stream, fake_slack, state_path):
+    big = make_subscriber("big", "C-BIG", "amount >= 100")
+    risky = make_subscriber("risky", "C-RISKY", "risk >= 50")
+    rows = [
+        {'id': 1, 'status': 'in_progress', 'amount': 200, 'risk': 10, 'owner_merchant_id': 1, 'project_id': 1},
+        {'id': 2, 'status': 'in_progress', 'amount': 10, 'risk': 80, 'owner_merchant_id': 1, 'project_id': 1},
+        {'id': 3, 'status': 'in_progress', 'amount': 500, 'risk': 90, 'owner_merchant_id': 1, 'project_id': 1},
+    ]
+
+    cursor = run_stream(rows, [big, risky], watermark=0)
+    wait_for(lambda: fake_slack.count('chat.postMessage') == 4)
+
+    # Один запрос на страницу для обоих подписчиков.
+    assert cursor.pages[0] == [1, 2, 3]
+    assert posted(fake_slack, "C-BIG") == ["big #1 -> 1001", "big #3 -> 1003"]
+    assert posted(fake_slack, "C-RISKY") == ["risky #2 -> 1002", "risky #3 -> 1003"]
+
+
+def test_watermark_passes_rows_no_subscriber_wants(run_stream, fake_slack, state_path):
+    risky = make_subscriber("risky", "C-RISKY", "risk >= 50")
+    rows = [
+        {'id': 1, 'status': 'in_progress', 'amount': 10, 'risk': 80, 'owner_merchant_id': 1, 'project_id': 1},
+        {'id': 2, 'status': 'in_progress', 'amount': 10, 'risk': 5, 'owner_merchant_id': 1, 'project_id': 1},
+        {'id': 3, 'status': 'in_progress', 'amount': 10, 'risk': 5, 'owner_merchant_id': 1, 'project_id': 1},
+    ]
+
+    run_stream(rows, [risky], watermark=0)
+
+    # Последние строки отфильтрованы в SQL, но водяной знак всё равно доходит до MAX(id).
+    assert StateStore("stream", state_path).load_watermark() == 3
+
+
+def test_unmatched_row_waits_in_pending_without_holding_watermark(run_stream, fake_slack, state_path, monkeypatch):
+    monkeypatch.setattr(FakeIndex, "missing", {2})
+    risky = make_subscriber("risky", "C-RISKY", "risk >= 50")
+    rows = [
+        {'id': 1, 'status': 'in_progress', 'amount': 10, 'risk': 80, 'owner_merchant_id': 1, 'project_id': 1},
+        {'id': 2, 'status': 'in_progress', 'amount': 10, 'risk': 80, 'owner_merchant_id': 1, 'project_id': 1},
+    ]
+
+    run_stream(rows, [risky], watermark=0)
+    wait_for(lambda: fake_slack.count('chat.postMessage') == 1)
+
+    restarted = StateStore("stream", state_path)
+    assert restarted.load_watermark() == 2
+    assert set(restarted.load_pending()) == {2}
+    assert posted(fake_slack, "C-RISKY") == ["risky #1 -> 1001"]
+
+
+def risky_rows(count):
+    return [
+        {'id': number, 'status': 'in_progress', 'amount': number, 'risk': 80, 'owner_merchant_id': 1, 'project_id': 1}
+        for number in range(1, count + 1)
+    ]
+
+
+def test_digest_is_decided_once_per_cycle_across_pages(run_stream, fake_slack, monkeypatch):
+    monkeypatch.setattr(transaction_stream, "iter_pages", partial(iter_pages, page_size=2))
+    monkeypatch.setattr(digest, "DIGEST_ROW_THRESHOLD", 5)
+    risky = make_subscriber("risky", "C-RISKY", "risk >= 50", lambda row: str(row['amount']))
+
+    cursor = run_stream(risky_rows(5), [risky], watermark=0)
+    wait_for(lambda: fake_slack.count('chat.postMessage') == 1)
+
+    # По отдельности ни одна страница до порога не дотягивает, а цикл целиком — да.
+    assert cursor.pages[:3] == [[1, 2], [3, 4], [5]]
+    assert posted(fake_slack, "C-RISKY")[0].startswith(">*risky* — 5 new transactions")
+    assert risky.tracked_transactions.digest_id(5) == 1
+
+
+def test_long_tail_is_split_into_digests_of_max_rows(run_stream, fake_slack, state_path, monkeypatch):
+    monkeypatch.setattr(transaction_stream, "iter_pages", partial(iter_pages, page_size=2))
+    monkeypatch.setattr(transaction_stream, "DIGEST_MAX_ROWS", 4)
+    monkeypatch.setattr(digest, "DIGEST_ROW_THRESHOLD", 2)
+    risky = make_subscriber("risky", "C-RISKY", "risk >= 50", lambda row: str(row['amount']))
+
+    run_stream(risky_rows(6), [risky], watermark=0)
+    wait_for(lambda: fake_slack.count('chat.postMessage') == 2)
+
+    assert [text.split(" — ")[1].split("\n")[0] for text in posted(fake_slack, "C-RISKY")] == [
+        "2 new transactions",
+        "4 new transactions",
+    ]
+    assert StateStore("stream", state_path).load_watermark() == 6
@@ -0,0 +1,78 @@
+import os
+import time
+from collections import OrderedDict
+
+TERMINAL_STATUSES = tuple(
+    status.strip() for status in os.environ.get("TERMINAL_STATUSES", "success,rejected").split(",")
+)
+# Сколько секунд следить за транзакцией, которая так и не дошла до финального статуса.
+TRACKING_MAX_AGE = float(os.environ.get("TRACKING_MAX_AGE", 7 * 24 * 3600))
+TRACKING_MAX_SIZE = int(os.environ.get("TRACKING_MAX_SIZE", 50000))
+
+
+class TrackedTransactions:
+    # Транзакции, по которым ещё ждём смены статуса: id -> ts сообщения и последний статус.
+    # Транзакция удаляется, как только дошла до финального статуса, устарела
+    # или вытеснена более новыми при превышении TRACKING_MAX_SIZE.
+
+    def __init__(self, on_evict=None):
+        self._entries = OrderedDict()
+        self._on_evict = on_evict
+        self.metrics = {'evicted_terminal': 0, 'evicted_expired': 0, 'evicted_overflow': 0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, transaction_id):
+        return transaction_id in self._entries
+
+    def _evict(self, transaction_id, reason):
+        del self._entries[transaction_id]
+        self.metrics[f'evicted_{reason}'] += 1
+        if self._on_evict is not None:
+            self._on_evict(transaction_id)
+
+    def track(self, transaction_id, ts, status=None, tracked_at=None, digest_id=None):
+        # digest_id — id сводки (первой строки в ней), если ts — это сводное сообщение
+        # и его тред общий для нескольких транзакций.
+        self._entries[transaction_id] = {
+            'ts': ts,
+            'status': status,
+            'digest_id': digest_id,
+            'tracked_at': time.time() if tracked_at is None else tracked_at,
+        }
+        self._entries.move_to_end(transaction_id)
+        if status in TERMINAL_STATUSES:
+            self._evict(transaction_id, 'terminal')
+            return
+        while len(self._entries) > TRACKING_MAX_SIZE:
+            self._evict(next(iter(self._entries)), 'overflow')
+
+    def ts(self, transaction_id):
+        return self._entries[transaction_id]['ts']
+
+    def digest_id(self, transaction_id):
+        return self._entries[transaction_id]['digest_id']
+
+    def status(self, transaction_id):
+        return self._entries[transaction_id]['status']
+
+    def set_status(self, transaction_id, status):
+        self._entries[transaction_id]['status'] = status
+        if status in TERMINAL_STATUSES:
+            self._evict(transaction_id, 'terminal')
+
+    def known_statuses(self):
+        return {transaction_id: entry['status'] for transaction_id, entry in self._entries.items()}
+
+    def evict_expired(self):
+        # Записи упорядочены по времени постановки на отслеживание — старые в начале.
+        cutoff = time.time() - TRACKING_MAX_AGE
+        while self._entries:
+            transaction_id, entry = next(iter(self._entries.items()))
+            if entry['tracked_at'] >= cutoff:
+                break
+            self._evict(transaction_id, 'expired')
+
+    def get_metrics(self):
+        return dict(self.metrics, size=len(self._entries))
@@ -0,0 +1,397 @@
+import time
+
+from catch_up import CATCHUP_MAX_INDIVIDUAL, count_backlog, format_backlog_digest, summarize_backlog
+from cdc import wait_for_changes
+from cycle_timing import CycleTimer
+from db_pool import db_cursor
+from digest import DIGEST_MAX_ROWS, format_digest, should_digest
+from keyset_pages import iter_pages
+from merchants_data import get_merchants_data
+from monitor_health import register_loop, report_cycle
+from notification_latency import mark_seen, record_enqueued
+from outbox import Outbox
+from pending_correlations import PendingCorrelations
+from poll_interval import AdaptivePollInterval
+from project_cache import get_project_names
+from project_transactions_data import ProjectTransactionsIndex
+from slack_delivery import slack_delivery
+from state_store import StateStore
+from status_refresh import STATUS_COLUMNS, fetch_changed_statuses, select_by_ids
+from tracking import TrackedTransactions
+
+
+class Subscriber:
+    # Один тип уведомлений о строках таблицы: SQL-фильтр, канал и шаблоны сообщений.
+    # Свои ts, статусы и outbox у каждого подписчика отдельные.
+    # render_status получает строку со столбцами thread_columns потока;
+    # без render_digest_amount подписчик всегда шлёт отдельные сообщения.
+
+    def __init__(
+        self,
+        name,
+        table,
+        channel,
+        title,
+        render_message,
+        render_status,
+        condition="1 = 1",
+        params=(),
+        render_digest_amount=None,
+    ):
+        self.name = name
+        self.table = table
+        self.channel = channel
+        self.title = title
+        self.render_message = render_message
+        self.render_status = render_status
+        self.condition = condition
+        self.params = params
+        self.render_digest_amount = render_digest_amount
+        self.state_store = StateStore(name)
+        self.outbox = Outbox(name, slack_delivery)
+        self.tracked_transactions = TrackedTransactions(on_evict=self.state_store.forget)
+
+    def restore(self):
+        for transaction_id, (ts, status, tracked_at, digest_id) in self.state_store.load_tracked().items():
+            self.tracked_transactions.track(transaction_id, ts, status, tracked_at=tracked_at, digest_id=digest_id)
+
+    def track(self, transaction, ts, digest_id=None):
+        # ts — Future от очереди доставки; сам ts сохраняем, когда Slack ответит.
+        def save_ts(done):
+            if transaction["id"] in self.tracked_transactions:
+                self.state_store.save_message_ts(transaction["id"], done.result())
+
+        tracked_at = time.time()
+        self.state_store.save_status(transaction["id"], transaction["status"])
+        self.state_store.save_tracked_at(transaction["id"], tracked_at)
+        if digest_id is not None:
+            self.state_store.save_digest_id(transaction["id"], digest_id)
+        self.tracked_transactions.track(
+            transaction["id"], ts, transaction["status"], tracked_at=tracked_at, digest_id=digest_id
+        )
+        ts.add_done_callback(save_ts)
+        record_enqueued(self.name, transaction, ts)
+
+    def send(self, ready):
+        # ready: кортежи (строка, проект, мерчант, id транзакции в ядре или None).
+        if self.render_digest_amount is not None and should_digest(len(ready), slack_delivery):
+            self.send_digest(ready)
+            return
+
+        for transaction, project_name, merchant_name, real_transaction_id in ready:
+            ts = self.outbox.post(
+                self.table,
+                transaction['id'],
+                transaction['status'],
+                self.channel,
+                self.render_message(transaction, project_name, merchant_name, real_transaction_id),
+            )
+            self.track(transaction, ts)
+
+    def send_digest(self, ready):
+        lines = [
+            (f"#{row['id']}", merchant_name, self.render_digest_amount(row), row['status'])
+            for row, project_name, merchant_name, real_transaction_id in ready
+        ]
+        digest_id = ready[0][0]['id']
+        ts = self.outbox.post(
+            f"{self.table}:digest",
+            digest_id,
+            'digest',
+            self.channel,
+            format_digest(self.title, lines),
+        )
+        for row, *_ in ready:
+            self.track(row, ts, digest_id=digest_id)
+
+    def update_status(self, transaction):
+        if transaction["id"] not in self.tracked_transactions:
+            return
+
+        current_status = transaction["status"]
+        previous_status = self.tracked_transactions.status(transaction["id"])
+
+        if previous_status is not None and current_status != previous_status:
+            # Строки из сводки отвечают в тред сводки, поэтому там у ответа есть номер транзакции.
+            digest_id = self.tracked_transactions.digest_id(transaction["id"])
+            status_text = self.render_status(transaction)
+            if digest_id is not None:
+                status_text = f"#{transaction['id']}: {status_text}"
+
+            self.outbox.post(
+                self.table,
+                transaction['id'],
+                current_status,
+                self.channel,
+                status_text,
+                reply=True,
+                thread_ts=self.tracked_transactions.ts(transaction["id"]),
+                parent=(f"{self.table}:digest", digest_id) if digest_id is not None else None,
+            )
+        self.state_store.save_status(transaction["id"], current_status)
+        self.tracked_transactions.set_status(transaction["id"], current_status)
+
+    def post_catch_up_digest(self, summary, merchants):
+        self.outbox.post(
+            f"{self.table}:catch_up",
+            summary['to_id'],
+            'digest',
+            self.channel,
+            format_backlog_digest(self.title, summary, merchants),
+        )
+
+    def flush(self):
+        self.tracked_transactions.evict_expired()
+        self.state_store.flush()
+
+
+class TransactionStream:
+    # Опрос одной таблицы на всех подписчиков: водяной знак, повторы сопоставления
+    # и запрос статусов общие, сообщения каждый подписчик шлёт сам.
+    # kind — слово для логов ("withdrawal", "deposit"); correlate=False отключает
+    # поиск транзакции в ядре, тогда в render_message приходит None.
+
+    def __init__(
+        self,
+        name,
+        table,
+        columns,
+        amount_column,
+        currency_column,
+        kind,
+        correlate=True,
+        thread_columns=STATUS_COLUMNS,
+    ):
+        self.name = name
+        self.table = table
+        self.columns = columns
+        self.amount_column = amount_column
+        self.currency_column = currency_column
+        self.kind = kind
+        self.correlate = correlate
+        self.thread_columns = thread_columns
+        self.state_store = StateStore(name)
+        self.poll_interval = AdaptivePollInterval(name)
+        self.cycle_timer = CycleTimer(name)
+
+    def get_current_last_id(self):
+        with db_cursor() as cursor:
+            cursor.execute(f"SELECT MAX(id) AS max_id FROM {self.table}")
+            return cursor.fetchone()['max_id']
+
+    def load_watermark(self, subscribers):
+        last_processed_id = self.state_store.load_watermark()
+        if last_processed_id is not None:
+            return last_processed_id
+
+        # Раньше каждый подписчик был отдельным монитором со своим водяным знаком.
+        previous = [subscriber.state_store.load_watermark() for subscriber in subscribers]
+        previous = [watermark for watermark in previous if watermark is not None]
+        return min(previous) if previous else None
+
+    def catch_up_backlog(self, subscribers, merchants, last_processed_id):
+        with db_cursor() as cursor:
+            condition, params = _any_condition(subscribers)
+            upper_id, count = count_backlog(cursor, self.table, last_processed_id, condition, params)
+            if count <= CATCHUP_MAX_INDIVIDUAL:
+                return last_processed_id
+
+            summaries = [
+                (
+                    subscriber,
+                    summarize_backlog(
+                        cursor,
+                        self.table,
+                        last_processed_id,
+                        self.amount_column,
+                        self.currency_column,
+                        subscriber.condition,
+                        subscriber.params,
+                        min_count=0,
+                        upper_id=upper_id,
+                    ),
+                )
+                for subscriber in subscribers
+            ]
+
+        for subscriber, summary in summaries:
+            if summary is not None:
+                subscriber.post_catch_up_digest(summary, merchants)
+        return upper_id
+
+    def run(self, subscribers):
+        cycle_timer = self.cycle_timer
+        register_loop(
+            self.name,
+            self.table,
+            {subscriber.name: subscriber.tracked_transactions for subscriber in subscribers},
+        )
+        merchants = get_merchants_data()
+        last_processed_id = self.load_watermark(subscribers)
+        if last_processed_id is None:
+            last_processed_id = self.get_current_last_id()
+        else:
+            for subscriber in subscribers:
+                subscriber.restore()
+            last_processed_id = self.catch_up_backlog(subscribers, merchants, last_processed_id)
+        for subscriber in subscribers:
+            subscriber.outbox.drain(force=True)
+
+        # Какому подписчику нужна строка, считает сама база: match_N = условие N-го подписчика.
+        match_columns = [
+            f"({subscriber.condition}) AS match_{number}" for number, subscriber in enumerate(subscribers)
+        ]
+        match_params = sum((subscriber.params for subscriber in subscribers), ())
+        any_condition, any_params = _any_condition(subscribers)
+        columns = self.columns + tuple(match_columns)
+
+        project_transactions_index = None
+        pending_correlations = None
+        if self.correlate:
+            project_transactions_index = ProjectTransactionsIndex()
+            pending_correlations = PendingCorrelations(self.state_store)
+            saved_pending = self.state_store.load_pending()
+            if saved_pending:
+                with db_cursor() as cursor:
+                    pending_rows = select_by_ids(cursor, self.table, columns, list(saved_pending), match_params)
+                mark_seen(pending_rows)
+                pending_correlations.restore(pending_rows, saved_pending)
+
+        def correlate(cursor, result, retry_rows):
+            # -> [(строка, id транзакции в ядре)] для строк, которые можно отправлять.
+            if project_transactions_index is None:
+                return [(row, None) for row in result]
+
+            project_transactions_index.refresh(cursor, result + retry_rows)
+            cycle_timer.lap('correlation_index')
+            ready = []
+
+            for row in result:
+                real_transaction_id = project_transactions_index.find_real_transaction_id(cursor, row)
+
+                if real_transaction_id is None:
+                    print(f"Warning: Real transaction ID not found for {self.kind} transaction ID {row['id']}, will retry")
+                    pending_correlations.add(row)
+                    continue
+
+                ready.append((row, real_transaction_id))
+
+            for row in retry_rows:
+                real_transaction_id = project_transactions_index.find_real_transaction_id(cursor, row)
+
+                if real_transaction_id is None:
+                    if pending_correlations.record_failure(row['id']):
+                        continue
+                    print(f"Warning: Giving up on real transaction ID for {self.kind} transaction ID {row['id']}, sending without link")
+
+                pending_correlations.remove(row['id'])
+                ready.append((row, real_transaction_id))
+            return ready
+
+        def process_batch(cursor, result, retry_rows):
+            # -> [(строка, проект, мерчант, id транзакции в ядре)]; отправляет send().
+            project_names = get_project_names(cursor, [row['project_id'] for row in result + retry_rows])
+            cycle_timer.lap('project_names')
+            ready = [
+                (
+                    row,
+                    project_names.get(row['project_id'], 'Unknown'),
+                    merchants.get(row['owner_merchant_id'], 'Unknown'),
+                    real_transaction_id,
+                )
+                for row, real_transaction_id in correlate(cursor, result, retry_rows)
+            ]
+            cycle_timer.lap('matching')
+            return ready
+
+        def send(ready):
+            for number, subscriber in enumerate(subscribers):
+                matched = [entry for entry in ready if entry[0][f'match_{number}']]
+                if matched:
+                    subscriber.send(matched)
+            cycle_timer.lap('slack')
+
+        def save_watermark(last_processed_id):
+            for subscriber in subscribers:
+                subscriber.flush()
+            self.state_store.save_watermark(last_processed_id)
+            self.state_store.flush()
+
+        # None — полный цикл опроса; иначе CDC подсказывает, что изменилось с прошлого цикла.
+        changes = None
+        query = f"""
+            SELECT {', '.join(columns)} FROM {self.table}
+            WHERE id <= %s AND ({any_condition}) AND id > %s
+        """
+
+        while True:
+            cycle_timer.start()
+            with db_cursor() as cursor:
+                cycle_timer.lap('connect')
+                retry_rows = pending_correlations.due() if pending_correlations is not None else []
+                ready = process_batch(cursor, [], retry_rows) if retry_rows else []
+
+                new_rows = 0
+                if changes is None or changes['inserted']:
+                    # Верхняя граница фиксируется до фильтрации, чтобы водяной знак
+                    # проходил и мимо строк, не нужных ни одному подписчику.
+                    cursor.execute(f"SELECT MAX(id) AS max_id FROM {self.table}")
+                    upper_id = cursor.fetchone()['max_id'] or 0
+
+                    # Сводку или отдельные сообщения выбираем один раз на все строки цикла,
+                    # поэтому страницы копятся в ready и отправляются в конце. Водяной знак
+                    # сдвигается только после отправки: сообщения уже лежат в outbox, а строки
+                    # без пары сохраняются в state_store в той же транзакции, что и он, так что
+                    # при падении посреди хвоста ничего не потеряется и не уйдёт дважды.
+                    # Длинный хвост режется на части по DIGEST_MAX_ROWS строк.
+                    for page in iter_pages(cursor, query, match_params + (upper_id,) + any_params, last_processed_id):
+                        cycle_timer.lap('select')
+                        mark_seen(page)
+                        ready += process_batch(cursor, page, [])
+                        new_rows += len(page)
+                        last_processed_id = page[-1]['id']
+                        if len(ready) >= DIGEST_MAX_ROWS:
+                            send(ready)
+                            ready = []
+                            save_watermark(last_processed_id)
+                            cycle_timer.lap('state')
+                    cycle_timer.lap('select')
+                    last_processed_id = max(last_processed_id or 0, upper_id)
+                send(ready)
+
+                # Один запрос статусов на всех подписчиков; при расхождении известных
+                # статусов строка возвращается, а подписчик сам решает, что изменилось.
+                known_statuses = {}
+                for subscriber in subscribers:
+                    for transaction_id, status in subscriber.tracked_transactions.known_statuses().items():
+                        if known_statuses.get(transaction_id, status) != status:
+                            status = None
+                        known_statuses[transaction_id] = status
+                if changes is not None:
+                    known_statuses = {
+                        transaction_id: status
+                        for transaction_id, status in known_statuses.items()
+                        if transaction_id in changes['updated']
+                    }
+                changed_rows = fetch_changed_statuses(cursor, self.table, known_statuses, self.thread_columns)
+                for row in changed_rows:
+                    for subscriber in subscribers:
+                        subscriber.update_status(row)
+                cycle_timer.lap('status_refresh')
+
+                save_watermark(last_processed_id)
+                cycle_timer.lap('state')
+
+            for subscriber in subscribers:
+                subscriber.outbox.drain()
+            cycle_timer.lap('outbox_drain')
+            cycle_timer.finish()
+            report_cycle(self.name, last_processed_id)
+
+            changes = wait_for_changes(self.table, self.poll_interval.next(new_rows + len(changed_rows)))
+
+
+def _any_condition(subscribers):
+    condition = " OR ".join(f"({subscriber.condition})" for subscriber in subscribers)
+    params = sum((subscriber.params for subscriber in subscribers), ())
+    return condition, params